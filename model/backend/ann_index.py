@@ -0,0 +1,156 @@
+import json
+import math
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+ANN_INDEX_DIR = os.getenv("ANN_INDEX_DIR", os.path.join(os.path.dirname(__file__), '..', 'central_data', 'ann_index'))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+KMEANS_ITERATIONS = 20
+# k-means runs on a sample; this many points per list is plenty for stable centroids.
+KMEANS_POINTS_PER_LIST = 256
+ASSIGN_CHUNK_SIZE = 65536
+
+def default_nlist(count: int) -> int:
+    """The usual IVF rule of thumb: about 4 * sqrt(N) inverted lists."""
+    return max(1, min(count, int(4 * math.sqrt(count))))
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def _assign(vectors, centroids):
+    """Index of the most similar centroid for each vector, computed in chunks to bound memory."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_CHUNK_SIZE):
+        chunk = np.asarray(vectors[start:start + ASSIGN_CHUNK_SIZE], dtype=np.float32)
+        assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+def spherical_kmeans(vectors, nlist: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0):
+    """k-means on the unit sphere (cosine similarity), seeded from a random sample of the data."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * KMEANS_POINTS_PER_LIST)
+    sample = vectors[np.sort(rng.choice(len(vectors), size=sample_size, replace=False))]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids)
+        counts = np.bincount(assignments, minlength=nlist)
+        # Sum each cluster with one reduceat over the sample sorted by cluster.
+        used = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)))[used]
+        sums = np.zeros_like(centroids)
+        sums[used] = np.add.reduceat(sample[np.argsort(assignments, kind="stable")], starts, axis=0)
+        # Empty lists are re-seeded from random points so every list ends up used.
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = sample[rng.choice(len(sample), size=len(empty), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+class IVFIndex:
+    """
+    An inverted-file ANN index over unit-normalised embeddings. A spherical
+    k-means quantizer splits the vectors into `nlist` lists; a query scans
+    only the `nprobe` lists whose centroids are closest to it, so `nprobe`
+    trades recall for latency. Vectors are stored grouped by list, so each
+    probe is one contiguous slice of the (memory-mapped) matrix.
+
+    `rows` maps each stored vector back to its row in the matrix the index
+    was built from, and `labels` (e.g. ASINs) name those rows.
+    """
+    FILES = ("centroids.npy", "offsets.npy", "rows.npy", "vectors.npy")
+
+    def __init__(self, centroids, offsets, rows, vectors, labels=None, meta=None):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.vectors = vectors
+        self.labels = labels
+        self.meta = meta or {}
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, embeddings, nlist: int = None, labels=None, iterations: int = KMEANS_ITERATIONS, seed: int = 0):
+        vectors = _normalize(embeddings)
+        nlist = nlist or default_nlist(len(vectors))
+        centroids = spherical_kmeans(vectors, nlist, iterations, seed)
+        assignments = _assign(vectors, centroids)
+
+        rows = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=nlist)))).astype(np.int64)
+        meta = {
+            "count": len(vectors), "dim": int(vectors.shape[1]), "nlist": nlist, "iterations": iterations,
+            "seed": seed, "built_at": datetime.now(timezone.utc).isoformat()
+        }
+        return cls(centroids, offsets, rows, np.ascontiguousarray(vectors[rows]),
+                   list(labels) if labels is not None else None, meta)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name, array in zip(self.FILES, (self.centroids, self.offsets, self.rows, self.vectors)):
+            np.save(os.path.join(directory, name), array)
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({**self.meta, "labels": self.labels}, f)
+
+    @classmethod
+    def load(cls, directory: str = ANN_INDEX_DIR, mmap: bool = True):
+        """
+        Loads a saved index. With `mmap`, the vector matrix stays on disk and
+        is paged in by the lists queries actually probe; forked workers share
+        the same page cache instead of each holding a copy.
+        """
+        centroids, offsets, rows, vectors = [
+            np.load(os.path.join(directory, name), mmap_mode='r' if mmap and name == "vectors.npy" else None)
+            for name in cls.FILES
+        ]
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        labels = meta.pop("labels", None)
+        return cls(centroids, offsets, rows, vectors, labels, meta)
+
+    def search(self, query, k: int, nprobe: int = ANN_NPROBE, row_mask=None):
+        """
+        Returns (rows, similarities) of up to `k` approximate nearest
+        neighbours, best first. `row_mask` is a boolean array over the build
+        rows; when filtering leaves fewer than `k` hits, `nprobe` is doubled
+        until it does or every list has been scanned.
+        """
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = _normalize(query)
+        centroid_scores = self.centroids @ query
+        nprobe = max(1, min(nprobe, self.nlist))
+        while True:
+            probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+            row_parts, score_parts = [], []
+            for list_id in probed:
+                start, end = self.offsets[list_id], self.offsets[list_id + 1]
+                if start == end:
+                    continue
+                rows = self.rows[start:end]
+                scores = self.vectors[start:end] @ query
+                if row_mask is not None:
+                    keep = row_mask[rows]
+                    rows, scores = rows[keep], scores[keep]
+                row_parts.append(rows)
+                score_parts.append(scores)
+            rows = np.concatenate(row_parts) if row_parts else np.empty(0, dtype=np.int64)
+            scores = np.concatenate(score_parts) if score_parts else np.empty(0, dtype=np.float32)
+            if len(rows) >= k or nprobe >= self.nlist:
+                break
+            nprobe = min(nprobe * 2, self.nlist)
+
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
@@ -1,63 +1,410 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, Query, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware 
-from autosuggest_service import autosuggest_service
-from search_service import search_service
-import json
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
+from sentence_transformers import SentenceTransformer
+from typing import Optional
+import asyncio
+import hmac
+import os
+from autosuggest_service import AutosuggestService
+from search_service import SearchService, ProductLookupError, EMBEDDING_MODEL_NAME, load_ads_table
+from merch_config import merch_config
+from entity_index import entity_index
+from query_events import popularity_updater, QUERY_EVENTS_ENABLED
+from query_understanding import parse_query
+from responses import (ORJSONResponse, cached_json_response, parse_fields, project_page, SEARCH_CARD_FIELDS,
+                       GZIP_MIN_SIZE, GZIP_LEVEL)
+from es_client import get_es_client, pool_stats, SEARCH_BACKEND
+from warmup import warm_up, load_top_queries
+from metrics import REGISTRY, ServerTimingMiddleware
+from profiler import (sampling_profiler, allocation_tracker, to_collapsed, to_speedscope,
+                      ProfilerBusyError, MAX_PROFILE_SECONDS)
+
+MAX_ES_RETRY_DELAY = 30
+STARTUP_MAX_ATTEMPTS = int(os.getenv("STARTUP_MAX_ATTEMPTS", "5"))
+# Admin endpoints (profiling) are disabled unless a token is configured.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+DEPARTMENTS_MAX_AGE = int(os.getenv("DEPARTMENTS_MAX_AGE", "300"))
+PRODUCT_MAX_AGE = int(os.getenv("PRODUCT_MAX_AGE", "60"))
+
+# Filled by serve.py in the master process before it forks the workers.
+preloaded = {}
+
+def preload_shared_state():
+    """
+    Builds the read-only heavy structures once, before forking, so workers
+    share their pages copy-on-write: the embedding model, the ads table and,
+    with SEARCH_BACKEND=local, the in-process search engine. Nothing here
+    opens a connection, so no socket is inherited by the workers.
+    """
+    preloaded["embedding_model"] = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    try:
+        load_ads_table()
+    except FileNotFoundError:
+        pass
+    if SEARCH_BACKEND == "local":
+        get_es_client()
+
+async def load_embedding_model():
+    if "embedding_model" in preloaded:
+        return preloaded["embedding_model"]
+    return await asyncio.to_thread(SentenceTransformer, EMBEDDING_MODEL_NAME)
+
+async def wait_for_elasticsearch(es_client):
+    """Retries the ES ping with backoff instead of crashing the worker on a transient outage."""
+    delay = 1
+    while True:
+        try:
+            if await asyncio.to_thread(es_client.ping):
+                return
+        except Exception as e:
+            print(f"Elasticsearch ping failed: {e}")
+        print(f"Elasticsearch not reachable; retrying in {delay}s...")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, MAX_ES_RETRY_DELAY)
+
+async def build_services(app: FastAPI):
+    """
+    Loads the model (unless serve.py preloaded it) and waits for ES
+    concurrently, builds both services on the shared model and client,
+    replays head queries, then marks the app ready.
+    """
+    app.state.startup_stage = "loading"
+    es_client = get_es_client()
+    embedding_model, _ = await asyncio.gather(
+        load_embedding_model(),
+        wait_for_elasticsearch(es_client)
+    )
+    search_service, autosuggest_service = await asyncio.gather(
+        asyncio.to_thread(SearchService, es_client, embedding_model),
+        asyncio.to_thread(AutosuggestService, es_client, embedding_model),
+        return_exceptions=True
+    )
+    failure = next((result for result in (search_service, autosuggest_service) if isinstance(result, BaseException)), None)
+    if failure is not None:
+        # The one that was built still holds a thread pool; the retry builds both again.
+        if isinstance(search_service, SearchService):
+            search_service.close()
+        raise failure
+    app.state.search_service = search_service
+    app.state.autosuggest_service = autosuggest_service
+
+    app.state.startup_stage = "warming_up"
+    queries = await asyncio.to_thread(load_top_queries)
+    await asyncio.to_thread(warm_up, search_service, autosuggest_service, queries)
+
+    if QUERY_EVENTS_ENABLED:
+        popularity_updater.start(es_client)
+
+    app.state.startup_stage = "ready"
+    app.state.ready = True
+    print("Search API is ready.")
+
+async def start_services(app: FastAPI):
+    """
+    Runs `build_services`, retrying with backoff when it raises. After
+    STARTUP_MAX_ATTEMPTS failures the stage stays "failed", which also fails
+    /health so the orchestrator restarts the instance.
+    """
+    delay = 1
+    for attempt in range(1, STARTUP_MAX_ATTEMPTS + 1):
+        try:
+            await build_services(app)
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Service startup failed (attempt {attempt}/{STARTUP_MAX_ATTEMPTS}): {e}")
+            if app.state.search_service is not None:
+                app.state.search_service.close()
+            app.state.search_service = None
+            app.state.autosuggest_service = None
+        if attempt < STARTUP_MAX_ATTEMPTS:
+            app.state.startup_stage = "retrying"
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_ES_RETRY_DELAY)
+    app.state.startup_stage = "failed"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup runs in the background so the port binds immediately; /ready reports when it is done.
+    app.state.ready = False
+    app.state.startup_stage = "starting"
+    app.state.search_service = None
+    app.state.autosuggest_service = None
+    merch_config.start_watching()
+    entity_index.start_watching()
+    startup_task = asyncio.create_task(start_services(app))
+    yield
+    startup_task.cancel()
+    merch_config.stop_watching()
+    entity_index.stop_watching()
+    await asyncio.to_thread(popularity_updater.stop)
+    if app.state.search_service is not None:
+        app.state.search_service.close()
 
 app = FastAPI(
     title="Flipkart GRID Search API",
     description="API for Autosuggest and Search Results Page systems.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-TOP_DEPARTMENTS=[]
-try:
-    with open('../central_data/top_departments.json', 'r') as f:
-        TOP_DEPARTMENTS = json.load(f)
-except FileNotFoundError:
-    print("Warning: 'top_departments.json' not found. Department dropdown will be empty.")
+def require_ready():
+    if not getattr(app.state, "ready", False):
+        raise HTTPException(status_code=503, detail="Service is starting up.", headers={"Retry-After": "5"})
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Without ADMIN_TOKEN the admin routes behave as if they did not exist.
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
 
+# Added first so it sits innermost: Server-Timing then covers compression too.
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(ServerTimingMiddleware)
+
+def collect_service_metrics():
+    """Cache and ES connection pool gauges for /metrics, read at scrape time."""
+    families = []
+    search_service = getattr(app.state, "search_service", None)
+    if search_service is not None:
+        caches = {
+            "search_results": search_service.result_cache, "facets": search_service.facet_cache,
+            "query_embeddings": search_service.embedding_cache, "products": search_service.product_cache
+        }
+        autosuggest_service = getattr(app.state, "autosuggest_service", None)
+        if autosuggest_service is not None:
+            caches["suggestions"] = autosuggest_service.suggestion_cache
+        stats = {name: cache.stats() for name, cache in caches.items()}
+        for field, metric_type in (("hits", "counter"), ("stale_hits", "counter"), ("misses", "counter"),
+                                   ("evictions", "counter"), ("size", "gauge"), ("hit_ratio", "gauge")):
+            metric_name = f"search_cache_{field}_total" if metric_type == "counter" else f"search_cache_{field}"
+            families.append((metric_name, metric_type, f"Search cache {field.replace('_', ' ')}.",
+                             [({"cache": name}, s[field]) for name, s in stats.items()]))
+        # Only the shared-memory caches report these: seqlock read retries, cross-worker write lock waits
+        # and values too large for a slot.
+        shared = {name: s for name, s in stats.items() if "read_retries" in s}
+        for field in ("read_retries", "write_waits", "oversize") if shared else ():
+            families.append((f"shared_cache_{field}_total", "counter", f"Shared cache {field.replace('_', ' ')}.",
+                             [({"cache": name}, s[field]) for name, s in shared.items()]))
+    if QUERY_EVENTS_ENABLED:
+        events = popularity_updater.stats()
+        families.append(("query_events_pending", "gauge", "Search queries waiting for the next popularity flush.",
+                         [({}, events["pending"])]))
+        for field in ("recorded", "dropped", "flushed", "update_errors"):
+            families.append((f"query_events_{field}_total", "counter", f"Query events {field.replace('_', ' ')}.",
+                             [({}, events[field])]))
+    nodes = pool_stats()
+    if nodes:
+        for field in ("maxsize", "in_use", "saturation"):
+            families.append((f"es_pool_{field}", "gauge", f"Elasticsearch connection pool {field.replace('_', ' ')}.",
+                             [({"node": n["node"]}, n[field]) for n in nodes]))
+    return families
+
+REGISTRY.register_collector(collect_service_metrics)
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Flipkart Search API"}
 
+@app.get("/health", tags=["Health"])
+def health():
+    """Liveness: the process is up and serving HTTP, and startup has not given up."""
+    if getattr(app.state, "startup_stage", None) == "failed":
+        return JSONResponse(status_code=503, content={"status": "failed"})
+    return {"status": "ok"}
+
+@app.get("/ready", tags=["Health"])
+def ready():
+    """Readiness: services are built and warmed up."""
+    if not getattr(app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": getattr(app.state, "startup_stage", "starting")})
+    return {"status": "ready"}
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of per-stage latency histograms, cache and pool gauges."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/autosuggest/departments", tags=["TopDepartments"])
-def get_top_departments():
-    return {"departments": TOP_DEPARTMENTS}
+def get_top_departments(if_none_match: Optional[str] = Header(None)):
+    return cached_json_response({"departments": merch_config.top_departments}, if_none_match, DEPARTMENTS_MAX_AGE)
 
-@app.get("/autosuggest", tags=["Autosuggest"])
+@app.get("/autosuggest", tags=["Autosuggest"], dependencies=[Depends(require_ready)])
 def get_autosuggestions(q: str):
     if not q:
         return {"suggestions": []}
     
-    suggestions = autosuggest_service.get_flipkart_style_suggestions(prefix=q)
+    suggestions = app.state.autosuggest_service.get_flipkart_style_suggestions(prefix=q)
     
-    return {"suggestions": suggestions}
+    return ORJSONResponse({"suggestions": suggestions})
 
-@app.get("/search", tags=["Search"])
-def search(q: str):
+MAX_PAGE_SIZE = 100
+
+def to_price_range(min_price, max_price):
+    if min_price is None and max_price is None:
+        return None
+    return (min_price, max_price)
+
+@app.get("/search", tags=["Search"], dependencies=[Depends(require_ready)])
+def search(
+    q: str,
+    discount: int = Query(0, ge=0, le=100),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    ratings: int = Query(0, ge=0, le=5),
+    page_size: int = Query(40, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    facets: bool = True,
+    fields: Optional[str] = Query(None, description="Comma-separated product fields to return, or 'all'. "
+                                                     "Defaults to the fields a result card renders.")
+):
     if not q:
         return {"results": [], "facets": {}}
-        
-    search_results = search_service.search_products(user_query=q)
-    return search_results
 
-@app.get("/api/v1/product/{asin}", tags=["Products"])
-def get_product_details(asin: str):
+    try:
+        search_results = app.state.search_service.search_products(
+            user_query=q, limit=page_size, discount=discount,
+            price_range=to_price_range(min_price, max_price), ratings=ratings,
+            cursor=cursor, include_facets=facets
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Only first pages count towards popularity; following a cursor is the same search.
+    if QUERY_EVENTS_ENABLED and cursor is None:
+        popularity_updater.record(parse_query(q).text)
+    # The cached page is shared, so the projection builds new dicts rather than trimming it.
+    page_fields = parse_fields(fields, SEARCH_CARD_FIELDS)
+    return ORJSONResponse({**search_results, "page_content": project_page(search_results["page_content"], page_fields)})
+
+@app.get("/search/facets", tags=["Search"], dependencies=[Depends(require_ready)])
+def search_facets(
+    q: str,
+    discount: int = Query(0, ge=0, le=100),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    ratings: int = Query(0, ge=0, le=5)
+):
+    """Facets for the SRP sidebar, for clients that call /search with facets=false."""
+    if not q:
+        return {"facets": {}}
+
+    facets = app.state.search_service.get_facets(
+        user_query=q, discount=discount, price_range=to_price_range(min_price, max_price), ratings=ratings
+    )
+    return ORJSONResponse({"facets": facets})
+
+@app.get("/search/cache/stats", tags=["Search"], dependencies=[Depends(require_ready)])
+def get_search_cache_stats():
+    return {
+        "search_results": app.state.search_service.result_cache.stats(),
+        "facets": app.state.search_service.facet_cache.stats(),
+        "query_embeddings": app.state.search_service.embedding_cache.stats(),
+        "products": app.state.search_service.product_cache.stats(),
+        "suggestions": app.state.autosuggest_service.suggestion_cache.stats()
+    }
+
+@app.get("/es/pool/stats", tags=["Search"])
+def get_es_pool_stats():
+    return {"nodes": pool_stats()}
+
+MAX_BATCH_ASINS = 100
+
+@app.get("/api/v1/product/{asin}", tags=["Products"], dependencies=[Depends(require_ready)])
+def get_product_details(asin: str, if_none_match: Optional[str] = Header(None)):
     """
     Handles the API request to fetch a single product by its ASIN.
     """
-    product = search_service.get_product_by_asin(asin=asin)
+    try:
+        product = app.state.search_service.get_product_by_asin(asin=asin)
+    except ProductLookupError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     
     if not product:
         raise HTTPException(status_code=404, detail=f"Product with ID '{asin}' not found.")
     
-    return {"product": product}
+    return cached_json_response({"product": product}, if_none_match, PRODUCT_MAX_AGE)
+
+@app.get("/api/v1/products/batch", tags=["Products"], dependencies=[Depends(require_ready)])
+def get_products_batch(asins: str, fields: Optional[str] = None):
+    """
+    Fetches many products in one round trip, e.g. a product page plus its
+    recommendations. `asins` and `fields` are comma-separated; products come
+    back in request order and unknown ASINs are listed under `missing`.
+    """
+    asin_list = [a.strip() for a in asins.split(',') if a.strip()]
+    if len(asin_list) > MAX_BATCH_ASINS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ASINS} ASINs can be fetched at once.")
+    field_list = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+
+    try:
+        found = app.state.search_service.get_products_by_asins(asin_list, fields=field_list)
+    except ProductLookupError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return ORJSONResponse({
+        "products": [found[a] for a in dict.fromkeys(asin_list) if a in found],
+        "missing": [a for a in dict.fromkeys(asin_list) if a not in found]
+    })
+
+@app.post("/admin/profile", tags=["Admin"], dependencies=[Depends(require_admin)])
+def profile_process(
+    seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=100),
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+    include_idle: bool = False
+):
+    """
+    Samples every thread in this worker for `seconds` and returns the stacks
+    as a speedscope profile or as collapsed stacks for flamegraph.pl. Only
+    one profile runs at a time; nothing is sampled outside this call.
+    """
+    interval = interval_ms / 1000
+    try:
+        stacks = sampling_profiler.profile(seconds, interval=interval, include_idle=include_idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "collapsed":
+        return PlainTextResponse(to_collapsed(stacks))
+    return to_speedscope(stacks, interval, name=f"search-backend {seconds:g}s")
+
+@app.post("/admin/tracemalloc/start", tags=["Admin"], dependencies=[Depends(require_admin)])
+def start_allocation_tracking(frames: int = Query(10, ge=1, le=50)):
+    """Starts tracemalloc and records the baseline snapshot for the next diff."""
+    allocation_tracker.start(frames)
+    return {"tracing": allocation_tracker.tracing}
+
+@app.get("/admin/tracemalloc/diff", tags=["Admin"], dependencies=[Depends(require_admin)])
+def get_allocation_diff(
+    top: int = Query(25, ge=1, le=200),
+    key: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    filename: Optional[str] = None
+):
+    """
+    Allocation growth since the previous snapshot, largest first. Replay a
+    batch of /search requests between two calls and filter with e.g.
+    `filename=search_service` to see what each request leaves behind.
+    """
+    try:
+        return allocation_tracker.diff(top=top, key_type=key, filename_filter=filename)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/tracemalloc/stop", tags=["Admin"], dependencies=[Depends(require_admin)])
+def stop_allocation_tracking():
+    allocation_tracker.stop()
+    return {"tracing": allocation_tracker.tracing}
@@ -1,29 +1,30 @@
-from elasticsearch import Elasticsearch
 from sentence_transformers import SentenceTransformer
 import os
-import regex as re
+from es_client import get_es_client, ES_AUTOSUGGEST_TIMEOUT
+from metrics import stage_timer
+from query_understanding import ParsedQuery, parse_query
+from entity_index import entity_index
+from shared_cache import make_cache, query_embedding_cache
 
-ES_HOST = "http://localhost:9200"
+EMBEDDING_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
 INDEX_NAME = "products_index"
 SUGGESTER_INDEX = "autosuggest_index"
 SUGGESTER_NAME = "product-suggester"
+AUTOSUGGEST_KNN_CANDIDATES = int(os.getenv("AUTOSUGGEST_KNN_CANDIDATES", "50"))
+AUTOSUGGEST_CACHE_SIZE = int(os.getenv("AUTOSUGGEST_CACHE_SIZE", "8192"))
+# Short, so live popularity updates and entity index reloads show up quickly.
+AUTOSUGGEST_CACHE_TTL = float(os.getenv("AUTOSUGGEST_CACHE_TTL", "60"))
 
 class AutosuggestService:
-    def __init__(self):
+    def __init__(self, es_client=None, embedding_model=None):
         print("Initializing Autosuggest Service...")
-        self.hindi_pattern = re.compile(r'[\p{Devanagari}]')
-        self.es_client = Elasticsearch(ES_HOST)
-        if not self.es_client.ping():
-            raise ConnectionError("Could not connect to Elasticsearch")
-        self.embedding_model = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
+        self.es_client = (es_client or get_es_client()).options(request_timeout=ES_AUTOSUGGEST_TIMEOUT)
+        self.embedding_model = embedding_model or SentenceTransformer(EMBEDDING_MODEL_NAME)
+        self.entity_index = entity_index
+        self.embedding_cache = query_embedding_cache()
+        self.suggestion_cache = make_cache("suggestions", AUTOSUGGEST_CACHE_SIZE, AUTOSUGGEST_CACHE_TTL)
         print("Service Initialized.")
 
-    def detect_language(self, text: str) -> str:
-        """Detects if text contains Hindi characters"""
-        if self.hindi_pattern.search(text):
-            return 'hi'
-        return 'en'
-
 #     def prefix_suggestions(self, prefix: str, limit: int = 5):
 #         # Detect input language
 #         lang = self.detect_language(prefix)
@@ -99,15 +100,14 @@ class AutosuggestService:
 #                 "image": hit['_source'].get("image")  # optional
 #             })
             
-    def get_query_suggestions(self, prefix: str, limit: int = 4):
+    def get_query_suggestions(self, query: ParsedQuery, limit: int = 4):
         """Fetches popular user search queries, now with language support."""
         try:
-            lang = self.detect_language(prefix)
-            suggest_field = "suggest_hi" if lang == "hi" else "suggest"
+            suggest_field = "suggest_hi" if query.lang == "hi" else "suggest"
             
             body = {
                 "suggest": {
-                    "text": prefix, 
+                    "text": query.text, 
                     "query_suggester": {
                         "completion": {
                             "field": suggest_field, 
@@ -119,26 +119,25 @@ class AutosuggestService:
                 }
             }
             response = self.es_client.search(index="queries_index", body=body)
-            query_field = "query_text_hi" if lang == "hi" else "query_text"
+            query_field = "query_text_hi" if query.lang == "hi" else "query_text"
             return [{"suggestion": opt['_source'][query_field], "type": "query"} for opt in response['suggest']['query_suggester'][0]['options']]
         except Exception as e:
             print(f"Could not fetch query suggestions: {e}")
             return []
 
-    def get_product_suggestions(self, prefix: str, limit: int = 3):
+    def get_product_suggestions(self, query: ParsedQuery, limit: int = 3):
         """
         Fetches the most semantically relevant products.
         This is for users who are looking for a specific item.
         """
         try:
-            lang = self.detect_language(prefix)
-            query_embedding = self.embedding_model.encode(prefix, normalize_embeddings=True)
-            title_field = "title_hi" if lang == "hi" else "title"
+            query_embedding = self.embedding_cache.get_or_compute(query.text, lambda: self._encode(query.text))
+            title_field = "title_hi" if query.lang == "hi" else "title"
             body = {
                 "size": limit,
-                "knn": {"field": "embedding", "query_vector": query_embedding, "k": limit, "num_candidates": 50},
+                "knn": {"field": "embedding", "query_vector": query_embedding, "k": limit, "num_candidates": max(AUTOSUGGEST_KNN_CANDIDATES, limit)},
                 "_source": ["title", "title_hi", "image"],
-                "query": {"match": {"title": {"query": prefix, "fuzziness": "AUTO"}}}
+                "query": {"match": {"title": {"query": query.text, "fuzziness": "AUTO"}}}
             }
             response = self.es_client.search(index="products_index", body=body)
             return [{"suggestion": hit['_source'][title_field], "image": hit['_source'].get("image"), "type": "product"} for hit in response['hits']['hits']]
@@ -146,24 +145,33 @@ class AutosuggestService:
             print(f"Could not fetch product suggestions: {e}")
             return []
 
-    def get_category_suggestions(self, prefix: str, limit: int = 2):
+    def _encode(self, query_text: str):
+        with stage_timer("embed"):
+            return self.embedding_model.encode(query_text, normalize_embeddings=True)
+
+    def get_category_suggestions(self, query: ParsedQuery, limit: int = 2):
+        # Served from the in-memory entity index once index_entities.py has published it.
+        names = self.entity_index.lookup("categories", query.text, query.lang, limit)
+        if names is not None:
+            return [{"suggestion": f"in {name}", "original_name": name, "type": "category"} for name in names]
         try:
-            lang = self.detect_language(prefix)
-            name_field = "name_hi" if lang == "hi" else "name"
+            name_field = "name_hi" if query.lang == "hi" else "name"
             
-            body = {"size": limit, "query": {"match_phrase_prefix": {name_field: prefix}}}
+            body = {"size": limit, "query": {"match_phrase_prefix": {name_field: query.text}}}
             response = self.es_client.search(index="categories_index", body=body)
             return [{"suggestion": f"in {hit['_source'][name_field]}", "original_name": hit['_source'][name_field], "type": "category"} for hit in response['hits']['hits']]
         except Exception as e:
             print(f"Could not fetch category suggestions: {e}")
             return []
         
-    def get_brand_suggestions(self, prefix: str, limit: int = 1):
+    def get_brand_suggestions(self, query: ParsedQuery, limit: int = 1):
+        names = self.entity_index.lookup("brands", query.text, query.lang, limit)
+        if names is not None:
+            return [{"suggestion": name, "type": "brand"} for name in names]
         try:
-            lang = self.detect_language(prefix)
-            name_field = "name_hi" if lang == "hi" else "name"
+            name_field = "name_hi" if query.lang == "hi" else "name"
             
-            body = {"size": limit, "query": {"match_phrase_prefix": {name_field: prefix}}}
+            body = {"size": limit, "query": {"match_phrase_prefix": {name_field: query.text}}}
             response = self.es_client.search(index="brands_index", body=body)
             return [{"suggestion": hit['_source'][name_field], "type": "brand"} for hit in response['hits']['hits']]
         except Exception as e:
@@ -175,21 +183,37 @@ class AutosuggestService:
         Orchestrates fetching all suggestion types and blends them into a single,
         prioritized list for the best user experience.
         """
-        queries = self.get_query_suggestions(prefix)
-        products = self.get_product_suggestions(prefix)
-        categories = self.get_category_suggestions(prefix)
-        brands = self.get_brand_suggestions(prefix)
-        
+        with stage_timer("parse_query"):
+            query = parse_query(prefix)
+        cache_key = (query.text, query.lang)
+        cached = self.suggestion_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        with stage_timer("suggest_queries"):
+            queries = self.get_query_suggestions(query)
+        with stage_timer("suggest_products"):
+            products = self.get_product_suggestions(query)
+        with stage_timer("suggest_categories"):
+            categories = self.get_category_suggestions(query)
+        with stage_timer("suggest_brands"):
+            brands = self.get_brand_suggestions(query)
+        with stage_timer("suggest_dedupe"):
+            suggestions = self.blend_suggestions(queries, categories, products, brands)
+        # The fetchers return [] on errors, so an empty list may be an outage and is not cached.
+        if suggestions:
+            self.suggestion_cache.set(cache_key, suggestions)
+        return suggestions
+
+    def blend_suggestions(self, queries, categories, products, brands, limit: int = 15):
+        """Merges the suggestion types in priority order, dropping case-insensitive duplicates."""
         final_suggestions = []
         seen_suggestions = set()
 
         all_sugs_in_order = queries + categories + products + brands
-        
         for sug in all_sugs_in_order:
             if sug['suggestion'].lower() not in seen_suggestions:
                 final_suggestions.append(sug)
                 seen_suggestions.add(sug['suggestion'].lower())
 
-        return final_suggestions[:15]
-
-autosuggest_service = AutosuggestService()
\ No newline at end of file
+        return final_suggestions[:limit]
@@ -0,0 +1,53 @@
+import json
+import os
+
+import pandas as pd
+
+CENTRAL_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'central_data')
+PRODUCTS_PATH = os.path.join(CENTRAL_DATA_DIR, 'flipkart-products-with-hindi.csv')
+EMBEDDINGS_PATH = os.path.join(CENTRAL_DATA_DIR, 'product_embeddings.csv')
+QUERY_LOG_PATH = os.path.join(CENTRAL_DATA_DIR, 'query_product_log.csv')
+
+def _json_list(value):
+    try:
+        parsed = json.loads(value)
+    except (TypeError, json.JSONDecodeError):
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+def load_product_frame(products_path: str = PRODUCTS_PATH, embeddings_path: str = EMBEDDINGS_PATH) -> pd.DataFrame:
+    """
+    Reads the product catalog joined with its embeddings, cleaned the way
+    the product index expects. Raises FileNotFoundError if either file is missing.
+    """
+    products_df = pd.read_csv(products_path)
+    products_df['image_url'] = products_df['image_url'].fillna('')
+    embeddings_df = pd.read_csv(embeddings_path)
+
+    data_df = pd.merge(products_df, embeddings_df, on='asin')
+    data_df.fillna({'images': '[]', 'product_specifications': '[]'}, inplace=True)
+    data_df.fillna(0, inplace=True)
+    return data_df
+
+def product_document(row) -> dict:
+    """The `products_index` document for one catalog row, embedding included."""
+    return {
+        "title": row['title'],
+        "title_hi": row['title_hi'],
+        "brand": row['brand'],
+        "image": row['image_url'],
+        "images": _json_list(row['images']),
+        "description": row['description'],
+        "description_hi": row['description_hi'],
+        "department": row['department'],
+        "embedding": json.loads(row['embedding']),
+        "rating": row['rating'],
+        "rating_count": row['rating_count'],
+        "reviews_count": row['reviews_count'],
+        "final_price": row['final_price'],
+        "discount_percentage": row['discount_percentage'],
+        "quality_score": row['quality_score'],
+        "bought_past_month": row['bought_past_month'],
+        "isAvailable": row['isAvailable'],
+        "product_specifications": _json_list(row['product_specifications'])
+    }
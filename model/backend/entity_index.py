@@ -0,0 +1,111 @@
+import heapq
+import json
+import os
+from bisect import bisect_left
+
+from merch_config import FileWatcher, CENTRAL_DATA_DIR, RELOAD_INTERVAL_SECONDS
+from query_understanding import normalize_text
+
+ENTITIES_PATH = os.path.join(CENTRAL_DATA_DIR, 'entities.json')
+MISSING_NAMES = {"", "na", "nan"}
+
+class PrefixIndex:
+    """
+    Names held as a sorted array of normalized keys, so a prefix lookup is a
+    binary search to the first key at or after the prefix and a scan while keys
+    still start with it. Every word-boundary suffix of a name is indexed too,
+    so "shoes" finds "Men's Shoes" the way match_phrase_prefix does.
+    """
+    __slots__ = ("keys", "entries")
+
+    def __init__(self, names_and_weights):
+        postings = []
+        for entry_id, (name, weight) in enumerate(names_and_weights):
+            words = normalize_text(name).split()
+            for start in range(len(words)):
+                postings.append((" ".join(words[start:]), entry_id))
+        postings.sort()
+        self.keys = [key for key, _ in postings]
+        self.entries = [(entry_id, names_and_weights[entry_id]) for _, entry_id in postings]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, prefix: str, limit: int):
+        """Up to `limit` distinct names starting with `prefix` (already normalized), heaviest first."""
+        if not prefix or limit <= 0:
+            return []
+        matches = {}
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and self.keys[position].startswith(prefix):
+            entry_id, (name, weight) = self.entries[position]
+            matches[entry_id] = (weight, name)
+            position += 1
+        return [name for weight, name in heapq.nsmallest(limit, matches.values(), key=lambda wn: (-wn[0], wn[1]))]
+
+class EntitySnapshot:
+    """English and Hindi prefix indexes over the published brands and categories."""
+    __slots__ = ("brands", "brands_hi", "categories", "categories_hi", "generated_at")
+
+    def __init__(self, payload: dict):
+        self.brands, self.brands_hi = self._build(payload.get("brands", []))
+        self.categories, self.categories_hi = self._build(payload.get("categories", []))
+        self.generated_at = payload.get("generated_at")
+
+    @staticmethod
+    def _build(entities):
+        english, hindi = [], []
+        for entity in entities:
+            weight = entity.get("weight", 0)
+            name, name_hi = str(entity.get("name", "")), str(entity.get("name_hi", ""))
+            if name.strip().lower() not in MISSING_NAMES:
+                english.append((name, weight))
+            if name_hi.strip().lower() not in MISSING_NAMES:
+                hindi.append((name_hi, weight))
+        return PrefixIndex(english), PrefixIndex(hindi)
+
+class EntityIndexStore:
+    """
+    Serves brand and category prefix lookups from the `entities.json` file
+    that index_entities.py publishes, reloading it when the file changes.
+    `snapshot` is None until a file has been loaded, so callers can fall
+    back to Elasticsearch.
+    """
+    def __init__(self, path: str = ENTITIES_PATH, reload_interval: float = RELOAD_INTERVAL_SECONDS):
+        self.path = path
+        self._snapshot = None
+        self.reload()
+        self._watcher = FileWatcher([path], self.reload, reload_interval)
+
+    def reload(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            # A half-written or malformed file keeps the previous snapshot.
+            print(f"Warning: Could not parse '{os.path.basename(self.path)}': {e}")
+            return
+        self._snapshot = EntitySnapshot(payload)
+        print(f"Entity index loaded: {len(self._snapshot.brands)} brand and {len(self._snapshot.categories)} category keys.")
+
+    def start_watching(self):
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._watcher.stop()
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def lookup(self, kind: str, prefix: str, lang: str, limit: int):
+        """Names of `kind` ('brands' or 'categories') matching the prefix, or None when nothing is loaded."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        index = getattr(snapshot, f"{kind}_hi" if lang == "hi" else kind)
+        return index.lookup(prefix, limit)
+
+entity_index = EntityIndexStore()
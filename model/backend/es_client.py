@@ -0,0 +1,92 @@
+from elasticsearch import Elasticsearch
+import os
+import threading
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+# "elasticsearch" talks to ES_HOST; "local" serves search from the in-process engine built from the catalog files.
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "elasticsearch").strip().lower()
+ES_HOST = os.getenv("ES_HOST", "http://localhost:9200")
+# Sync FastAPI endpoints run on a 40-thread pool and searches fan out to the facet pool,
+# so the default leaves one connection per thread that can be talking to ES at once.
+ES_CONNECTIONS_PER_NODE = int(os.getenv("ES_CONNECTIONS_PER_NODE", "48"))
+ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", "10"))
+ES_SEARCH_TIMEOUT = float(os.getenv("ES_SEARCH_TIMEOUT", "3"))
+ES_AUTOSUGGEST_TIMEOUT = float(os.getenv("ES_AUTOSUGGEST_TIMEOUT", "1"))
+ES_BULK_TIMEOUT = float(os.getenv("ES_BULK_TIMEOUT", "120"))
+ES_BULK_CHUNK_SIZE = int(os.getenv("ES_BULK_CHUNK_SIZE", "500"))
+ES_MAX_RETRIES = int(os.getenv("ES_MAX_RETRIES", "2"))
+ES_RETRY_ON_TIMEOUT = _env_flag("ES_RETRY_ON_TIMEOUT", True)
+ES_HTTP_COMPRESS = _env_flag("ES_HTTP_COMPRESS", True)
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def create_es_client(**overrides) -> Elasticsearch:
+    """
+    Builds an Elasticsearch client from the ES_* environment settings.
+    Request bodies (including bulk payloads) are gzip-compressed when
+    ES_HTTP_COMPRESS is on. Keyword arguments override any setting.
+    """
+    settings = {
+        "connections_per_node": ES_CONNECTIONS_PER_NODE,
+        "request_timeout": ES_REQUEST_TIMEOUT,
+        "max_retries": ES_MAX_RETRIES,
+        "retry_on_timeout": ES_RETRY_ON_TIMEOUT,
+        "http_compress": ES_HTTP_COMPRESS,
+    }
+    settings.update(overrides)
+    return Elasticsearch(ES_HOST, **settings)
+
+def create_search_backend():
+    """
+    Builds the retrieval backend selected by SEARCH_BACKEND. The services
+    only use the client calls `search`, `mget`, `open_point_in_time`,
+    `close_point_in_time`, `ping` and `options`, so any object providing
+    those with Elasticsearch-shaped responses can stand in for the client.
+    """
+    if SEARCH_BACKEND == "local":
+        from local_engine import LocalSearchEngine
+        return LocalSearchEngine.from_catalog()
+    if SEARCH_BACKEND != "elasticsearch":
+        raise ValueError(f"Unknown SEARCH_BACKEND '{SEARCH_BACKEND}'; expected 'elasticsearch' or 'local'.")
+    return create_es_client()
+
+def get_es_client():
+    """Returns the process-wide backend, so every service shares one connection pool (or one local index)."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = create_search_backend()
+    return _shared_client
+
+def pool_stats(client: Elasticsearch = None):
+    """
+    Reports connection pool usage per node. `in_use` counts connections
+    checked out right now; a saturation near 1.0 means requests are queueing
+    for a connection rather than for Elasticsearch.
+    """
+    client = client or _shared_client
+    if client is None or not hasattr(client, 'transport'):
+        return []
+    stats = []
+    for node in client.transport.node_pool.all():
+        pool = getattr(node, 'pool', None)
+        maxsize = getattr(pool, 'maxsize', None) or ES_CONNECTIONS_PER_NODE
+        idle_slots = getattr(pool, 'pool', None)
+        available = idle_slots.qsize() if idle_slots is not None else maxsize
+        in_use = max(maxsize - available, 0)
+        stats.append({
+            "node": str(node.base_url),
+            "maxsize": maxsize,
+            "in_use": in_use,
+            "saturation": in_use / maxsize if maxsize else 0.0,
+            "connections_opened": getattr(pool, 'num_connections', None),
+            "requests": getattr(pool, 'num_requests', None),
+        })
+    return stats
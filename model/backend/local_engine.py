@@ -0,0 +1,564 @@
+import bisect
+import heapq
+import math
+import os
+import uuid
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import regex as re
+
+from catalog import load_product_frame, product_document, PRODUCTS_PATH, EMBEDDINGS_PATH, QUERY_LOG_PATH
+from ann_index import IVFIndex, ANN_INDEX_DIR, ANN_NPROBE
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Elasticsearch stops counting hits exactly at this point by default.
+TRACK_TOTAL_HITS = 10000
+TEXT_FIELDS = ("title", "description", "title_hi", "description_hi", "product_specifications.value")
+HINDI_FIELDS = frozenset({"title_hi", "description_hi", "name_hi"})
+KEYWORD_FIELDS = ("brand", "department")
+NUMERIC_FIELDS = ("final_price", "discount_percentage", "rating", "rating_count", "reviews_count",
+                  "quality_score", "bought_past_month")
+# Lucene's English stop set, as used by the `english` analyzer.
+ENGLISH_STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in", "into", "is", "it", "no", "not",
+    "of", "on", "or", "such", "that", "the", "their", "then", "there", "these", "they", "this", "to", "was",
+    "will", "with"
+))
+TOKEN_PATTERN = re.compile(r'\w+')
+DEVANAGARI_PATTERN = re.compile(r'[\p{Devanagari}]')
+FUZZY_CACHE_SIZE = 8192
+
+def _light_stem(token: str) -> str:
+    """Harman's S-stemmer: folds plurals without the cost of a full Porter stemmer."""
+    if len(token) > 4 and token.endswith("ies") and not token.endswith(("eies", "aies")):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("es") and not token.endswith(("aes", "ees", "oes")):
+        return token[:-1]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("us", "ss")):
+        return token[:-1]
+    return token
+
+def analyze(text, field: str) -> list:
+    """Lowercased word tokens; English fields also drop stopwords and fold plurals."""
+    if not isinstance(text, str) or not text:
+        return []
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if field in HINDI_FIELDS:
+        return tokens
+    return [_light_stem(t) for t in tokens if t not in ENGLISH_STOPWORDS]
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if `a` and `b` differ by one insertion, deletion, substitution or adjacent transposition."""
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1:
+        return False
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) != len(b):
+        return a[i:] == b[i + 1:]
+    if i == len(a):
+        return False
+    if a[i + 1:] == b[i + 1:]:
+        return True
+    return i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+
+class _FieldIndex:
+    """
+    BM25 postings for one text field in CSR form: the doc ids and the fully
+    weighted term scores (idf and length normalisation already applied) for
+    each term sit in one contiguous slice, so scoring a term is a single
+    vectorised update.
+    """
+    __slots__ = ("terms", "offsets", "doc_ids", "weights")
+
+    def __init__(self, token_lists, num_docs: int):
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.float32, count=len(token_lists))
+        avgdl = float(lengths.mean()) if len(lengths) and lengths.sum() else 1.0
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avgdl)
+
+        self.terms = {}
+        term_ids, doc_ids, tfs = [], [], []
+        for doc_id, tokens in enumerate(token_lists):
+            for token, tf in Counter(tokens).items():
+                term_ids.append(self.terms.setdefault(token, len(self.terms)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        tf = np.asarray(tfs, dtype=np.float32)[order]
+        doc_freq = np.bincount(term_ids, minlength=len(self.terms))
+        self.offsets = np.concatenate(([0], np.cumsum(doc_freq))).astype(np.int64)
+
+        idf = np.log1p((num_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        self.weights = idf[term_ids[order]] * tf * (BM25_K1 + 1) / (tf + norms[self.doc_ids])
+
+    def postings(self, term):
+        term_id = self.terms.get(term)
+        if term_id is None:
+            return None
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+class _PhrasePrefixIndex:
+    """
+    Answers `match_phrase_prefix` over short names (brands, categories) by
+    bisecting a sorted list of every token-suffix of every name.
+    """
+    def __init__(self, names):
+        entries = []
+        for entity_id, name in enumerate(names):
+            tokens = TOKEN_PATTERN.findall(name.lower()) if isinstance(name, str) else []
+            for position in range(len(tokens)):
+                entries.append((" ".join(tokens[position:]), position, entity_id))
+        entries.sort()
+        self.keys = [key for key, _, _ in entries]
+        self.entries = entries
+
+    def lookup(self, phrase: str, size: int):
+        normalized = " ".join(TOKEN_PATTERN.findall(str(phrase).lower()))
+        if not normalized:
+            return []
+        lo = bisect.bisect_left(self.keys, normalized)
+        hi = bisect.bisect_left(self.keys, normalized + "\U0010ffff")
+        # Matches at the start of a name rank first, as they would on ES's position-aware scoring.
+        best = {}
+        for _, position, entity_id in self.entries[lo:hi]:
+            if entity_id not in best or position < best[entity_id]:
+                best[entity_id] = position
+        return [entity_id for entity_id, _ in sorted(best.items(), key=lambda item: (item[1], item[0]))[:size]]
+
+class LocalSearchEngine:
+    """
+    An in-process, Elasticsearch-free retrieval backend. It answers the same
+    client calls the services make (`search`, `mget`, `open_point_in_time`,
+    `close_point_in_time`, `ping`, `options`) over the `products_index`,
+    `queries_index`, `categories_index` and `brands_index` contents:
+
+    - `multi_match` / `match` with BM25 over the title, description and
+      specification fields (best_fields, `^boost` supported) and exact
+      matches on keyword fields; `fuzziness` repairs out-of-vocabulary
+      terms with one edit,
+    - kNN as a normalized dot product over the embedding matrix, exact by
+      default or through an attached IVF index (`attach_ann`), combined
+      with the text score the way a hybrid ES query sums them,
+    - `range`, `term` and `terms` filters, `terms` aggregations,
+    - `from`/`size`, point-in-time ids and `search_after` paging,
+    - completion suggesters and `match_phrase_prefix` on entity names.
+
+    The product index is immutable once built, so a point in time is simply
+    the engine itself and every PIT id stays valid. Only query suggestion
+    weights change, through `increment_query_weights`.
+    """
+    def __init__(self, asins, docs, embeddings, query_counts=None, brands=None, categories=None):
+        self.asins = list(asins)
+        self.docs = list(docs)
+        self.num_docs = len(self.docs)
+        self.doc_index = {asin: i for i, asin in enumerate(self.asins)}
+
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(self.num_docs, -1)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        self.embeddings = embeddings / np.where(norms == 0, 1, norms)
+
+        self.text_fields = {}
+        for field in TEXT_FIELDS:
+            if field == "product_specifications.value":
+                values = [" ".join(str(spec.get("value", "")) for spec in doc.get("product_specifications") or []
+                                   if isinstance(spec, dict)) for doc in self.docs]
+            else:
+                values = [doc.get(field) for doc in self.docs]
+            self.text_fields[field] = _FieldIndex([analyze(v, field) for v in values], self.num_docs)
+
+        self.keyword_codes, self.keyword_values, self.keyword_lookup = {}, {}, {}
+        for field in KEYWORD_FIELDS:
+            codes, uniques = pd.factorize(pd.Series([doc.get(field) for doc in self.docs], dtype=object))
+            self.keyword_codes[field] = codes.astype(np.int32)
+            self.keyword_values[field] = list(uniques)
+            self.keyword_lookup[field] = {value: code for code, value in enumerate(uniques)}
+
+        self.numeric = {
+            field: pd.to_numeric(pd.Series([doc.get(field) for doc in self.docs], dtype=object), errors="coerce")
+            .to_numpy(dtype=np.float64)
+            for field in NUMERIC_FIELDS
+        }
+
+        vocabulary = set()
+        for index in self.text_fields.values():
+            vocabulary.update(index.terms)
+        self._vocabulary_by_length = {}
+        for term in vocabulary:
+            self._vocabulary_by_length.setdefault(len(term), []).append(term)
+        self._fuzzy_variants = lru_cache(maxsize=FUZZY_CACHE_SIZE)(self._find_fuzzy_variants)
+
+        self.ann = None
+        self.nprobe = ANN_NPROBE
+
+        self._build_completions(query_counts or {})
+        if brands is None:
+            brands = sorted({(doc.get("brand"), "") for doc in self.docs if isinstance(doc.get("brand"), str)})
+        if categories is None:
+            categories = sorted({(doc.get("department"), "") for doc in self.docs if isinstance(doc.get("department"), str)})
+        self.entities = {}
+        for index, pairs in (("brands_index", brands), ("categories_index", categories)):
+            names = [{"name": name, "name_hi": name_hi} for name, name_hi in pairs]
+            self.entities[index] = (names, {
+                "name": _PhrasePrefixIndex([n["name"] for n in names]),
+                "name_hi": _PhrasePrefixIndex([n["name_hi"] for n in names])
+            })
+
+    @classmethod
+    def from_catalog(cls, products_path: str = PRODUCTS_PATH, embeddings_path: str = EMBEDDINGS_PATH,
+                     query_log_path: str = QUERY_LOG_PATH):
+        """Builds the engine from the catalog and query log files the ES indexers read."""
+        print("Building the local search engine from the catalog...")
+        data_df = load_product_frame(products_path, embeddings_path)
+        asins, docs, vectors = [], [], []
+        for row in data_df.to_dict(orient="records"):
+            doc = product_document(row)
+            vectors.append(doc.pop("embedding"))
+            asins.append(row["asin"])
+            docs.append(doc)
+
+        pairs = {}
+        for field, hi_field in (("brand", "brand_hi"), ("department", "department_hi")):
+            hi_values = data_df[hi_field] if hi_field in data_df.columns else pd.Series("", index=data_df.index)
+            frame = pd.DataFrame({"name": data_df[field], "name_hi": hi_values.replace(0, "")}).drop_duplicates()
+            pairs[field] = [(name, name_hi) for name, name_hi in frame.itertuples(index=False) if isinstance(name, str)]
+
+        try:
+            log_df = pd.read_csv(query_log_path).dropna(subset=["search_query"])
+            query_counts = log_df["search_query"].astype(str).value_counts().to_dict()
+        except FileNotFoundError:
+            query_counts = {}
+
+        engine = cls(asins, docs, np.array(vectors, dtype=np.float32), query_counts,
+                     brands=pairs["brand"], categories=pairs["department"])
+        if os.path.isdir(ANN_INDEX_DIR):
+            engine.attach_ann(IVFIndex.load(ANN_INDEX_DIR))
+            print(f"Attached the ANN index ({engine.ann.nlist} lists, nprobe={engine.nprobe}).")
+        print(f"Local search engine ready with {engine.num_docs} products.")
+        return engine
+
+    def attach_ann(self, index, nprobe: int = None):
+        """Serves kNN from an IVF index; its labels (ASINs) are mapped onto this engine's documents."""
+        if index.labels is not None:
+            self._ann_doc_ids = np.array([self.doc_index.get(label, -1) for label in index.labels], dtype=np.int64)
+        else:
+            self._ann_doc_ids = np.arange(len(index), dtype=np.int64)
+        # Rows for products this engine does not hold are never returned.
+        self._ann_valid_rows = self._ann_doc_ids >= 0
+        self.ann = index
+        if nprobe is not None:
+            self.nprobe = nprobe
+
+    # --- client surface -------------------------------------------------
+
+    def options(self, **kwargs):
+        return self
+
+    def ping(self, **kwargs):
+        return True
+
+    def open_point_in_time(self, index=None, keep_alive=None, **kwargs):
+        return {"id": uuid.uuid4().hex}
+
+    def close_point_in_time(self, id=None, body=None, **kwargs):
+        return {"succeeded": True, "num_freed": 1}
+
+    def mget(self, index=None, ids=None, body=None, _source=None, _source_includes=None, _source_excludes=None, **kwargs):
+        ids = ids if ids is not None else (body or {}).get("ids", [])
+        includes = _source_includes or (_source if isinstance(_source, list) else None)
+        docs = []
+        for asin in ids:
+            i = self.doc_index.get(asin)
+            if i is None:
+                docs.append({"_index": index, "_id": asin, "found": False})
+            else:
+                docs.append({"_index": index, "_id": asin, "found": True,
+                             "_source": self._source(i, includes, _source_excludes)})
+        return {"docs": docs}
+
+    def search(self, index=None, body=None, **kwargs):
+        body = body or {}
+        if "suggest" in body:
+            return self._suggest(body["suggest"])
+        if index in self.entities:
+            return self._entity_search(index, body)
+        return self._product_search(body)
+
+    # --- products -------------------------------------------------------
+
+    def _source(self, i, includes=None, excludes=None):
+        doc = self.docs[i]
+        if includes:
+            source = {k: doc[k] for k in includes if k in doc}
+            if "embedding" in includes:
+                source["embedding"] = self.embeddings[i].tolist()
+            return source
+        excluded = set(excludes or ())
+        source = {k: v for k, v in doc.items() if k not in excluded}
+        if "embedding" not in excluded:
+            source["embedding"] = self.embeddings[i].tolist()
+        return source
+
+    def _find_fuzzy_variants(self, term: str):
+        candidates = []
+        for length in (len(term) - 1, len(term), len(term) + 1):
+            candidates.extend(t for t in self._vocabulary_by_length.get(length, ()) if _within_one_edit(term, t))
+        return tuple(candidates)
+
+    def _expand(self, term: str, fuzzy: bool):
+        # ES's AUTO fuzziness allows no edits below three characters; out-of-vocabulary terms get one.
+        if not fuzzy or len(term) < 3 or any(term in index.terms for index in self.text_fields.values()):
+            return (term,)
+        return (term,) + self._fuzzy_variants(term)
+
+    def _match_scores(self, query_text: str, fields, fuzzy: bool):
+        """best_fields multi_match: each document keeps its best boosted field score."""
+        best = np.zeros(self.num_docs, dtype=np.float32)
+        for spec in fields:
+            field, _, boost = spec.partition("^")
+            boost = float(boost) if boost else 1.0
+            if field in self.keyword_codes:
+                # Keyword fields only match the whole query string.
+                code = self.keyword_lookup[field].get(query_text)
+                if code is None:
+                    continue
+                matches = self.keyword_codes[field] == code
+                idf = math.log1p((self.num_docs - matches.sum() + 0.5) / (matches.sum() + 0.5))
+                np.maximum(best, matches * np.float32(idf * boost), out=best)
+                continue
+            index = self.text_fields.get(field)
+            if index is None:
+                continue
+            field_scores = np.zeros(self.num_docs, dtype=np.float32)
+            for term in analyze(query_text, field):
+                term_scores = None
+                for variant in self._expand(term, fuzzy):
+                    postings = index.postings(variant)
+                    if postings is None:
+                        continue
+                    if term_scores is None:
+                        term_scores = np.zeros(self.num_docs, dtype=np.float32)
+                    doc_ids, weights = postings
+                    # A term's postings hold each document once, so a gather/scatter is exact here.
+                    term_scores[doc_ids] = np.maximum(term_scores[doc_ids], weights)
+                if term_scores is not None:
+                    field_scores += term_scores
+            np.maximum(best, field_scores * boost, out=best)
+        return best
+
+    def _query_scores(self, query):
+        """Returns (text scores, filters) for the supported query shapes; scores are None without a text query."""
+        if not query or "match_all" in query:
+            return None, []
+        filters = []
+        if "bool" in query:
+            filters = query["bool"].get("filter", [])
+            if isinstance(filters, dict):
+                filters = [filters]
+            query = query["bool"].get("must") or {}
+            if isinstance(query, list):
+                query = query[0] if query else {}
+            if not query:
+                return None, filters
+        if "multi_match" in query:
+            spec = query["multi_match"]
+            return self._match_scores(str(spec["query"]), spec.get("fields", ["title"]), bool(spec.get("fuzziness"))), filters
+        if "match" in query:
+            field, spec = next(iter(query["match"].items()))
+            if not isinstance(spec, dict):
+                spec = {"query": spec}
+            return self._match_scores(str(spec["query"]), [field], bool(spec.get("fuzziness"))), filters
+        raise ValueError(f"Unsupported query for the local engine: {list(query)}")
+
+    def _filter_mask(self, filters):
+        if not filters:
+            return None
+        mask = np.ones(self.num_docs, dtype=bool)
+        for clause in filters:
+            if "range" in clause:
+                for field, bounds in clause["range"].items():
+                    values = self.numeric.get(field)
+                    if values is None:
+                        raise ValueError(f"Range filter on unsupported field '{field}'.")
+                    with np.errstate(invalid="ignore"):
+                        if "gte" in bounds: mask &= values >= bounds["gte"]
+                        if "gt" in bounds: mask &= values > bounds["gt"]
+                        if "lte" in bounds: mask &= values <= bounds["lte"]
+                        if "lt" in bounds: mask &= values < bounds["lt"]
+            elif "term" in clause or "terms" in clause:
+                field, wanted = next(iter((clause.get("term") or clause.get("terms")).items()))
+                wanted = wanted if isinstance(wanted, list) else [wanted.get("value") if isinstance(wanted, dict) else wanted]
+                lookup = self.keyword_lookup.get(field)
+                if lookup is None:
+                    raise ValueError(f"Term filter on unsupported field '{field}'.")
+                codes = [lookup[v] for v in wanted if v in lookup]
+                mask &= np.isin(self.keyword_codes[field], codes)
+            else:
+                raise ValueError(f"Unsupported filter for the local engine: {list(clause)}")
+        return mask
+
+    def _knn(self, knn):
+        vector = np.asarray(knn["query_vector"], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else vector
+        mask = self._filter_mask(knn.get("filter"))
+        if self.ann is not None:
+            row_mask = self._ann_valid_rows if mask is None else self._ann_valid_rows & mask[np.maximum(self._ann_doc_ids, 0)]
+            rows, similarities = self.ann.search(vector, int(knn.get("k", 10)), self.nprobe, row_mask)
+            return self._ann_doc_ids[rows], (1 + similarities) / 2
+
+        similarities = self.embeddings @ vector
+        if mask is not None:
+            similarities = np.where(mask, similarities, -np.inf)
+        k = min(int(knn.get("k", 10)), self.num_docs)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.isfinite(similarities[top])]
+        # ES reports cosine kNN scores as (1 + cosine) / 2.
+        return top, (1 + similarities[top]) / 2
+
+    def _product_search(self, body):
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        matched = np.zeros(self.num_docs, dtype=bool)
+
+        text_scores, filters = self._query_scores(body.get("query"))
+        mask = self._filter_mask(filters)
+        if text_scores is not None:
+            matched = text_scores > 0
+            if mask is not None:
+                matched &= mask
+            scores = np.where(matched, text_scores, 0).astype(np.float32)
+        elif "knn" not in body:
+            matched = mask if mask is not None else np.ones(self.num_docs, dtype=bool)
+            scores = matched.astype(np.float32)
+        if "knn" in body:
+            knn_ids, knn_scores = self._knn(body["knn"])
+            scores[knn_ids] += knn_scores
+            matched[knn_ids] = True
+
+        hit_ids = np.flatnonzero(matched)
+        total = len(hit_ids)
+        response = {
+            "took": 0, "timed_out": False,
+            "hits": {"total": {"value": min(total, TRACK_TOTAL_HITS), "relation": "eq" if total <= TRACK_TOTAL_HITS else "gte"},
+                     "max_score": float(scores[hit_ids].max()) if total else None, "hits": []}
+        }
+        if "aggs" in body or "aggregations" in body:
+            response["aggregations"] = self._aggregate(body.get("aggs") or body.get("aggregations"), hit_ids)
+
+        size = int(body.get("size", 10))
+        start = 0 if body.get("search_after") else int(body.get("from", 0))
+        if body.get("search_after"):
+            after_score, after_doc = body["search_after"][:2]
+            hit_scores = scores[hit_ids]
+            hit_ids = hit_ids[(hit_scores < after_score) | ((hit_scores == after_score) & (hit_ids > after_doc))]
+
+        wanted = start + size
+        if size > 0 and len(hit_ids):
+            if len(hit_ids) > wanted:
+                # Keep everything tied with the cut-off score so the (score, doc) order stays exact.
+                cutoff = np.partition(scores[hit_ids], len(hit_ids) - wanted)[len(hit_ids) - wanted]
+                hit_ids = hit_ids[scores[hit_ids] >= cutoff]
+            ordered = hit_ids[np.lexsort((hit_ids, -scores[hit_ids]))][start:wanted]
+            includes = body.get("_source") if isinstance(body.get("_source"), list) else None
+            with_sort = "pit" in body or "sort" in body
+            for i in ordered:
+                hit = {"_index": "products_index", "_id": self.asins[i], "_score": float(scores[i]),
+                       "_source": self._source(i, includes)}
+                if with_sort:
+                    hit["sort"] = [float(scores[i]), int(i)]
+                response["hits"]["hits"].append(hit)
+        if "pit" in body:
+            response["pit_id"] = body["pit"]["id"]
+        return response
+
+    def _aggregate(self, aggs, hit_ids):
+        aggregations = {}
+        for name, spec in aggs.items():
+            terms = spec.get("terms")
+            if not terms or terms.get("field") not in self.keyword_codes:
+                raise ValueError(f"Unsupported aggregation for the local engine: {name}")
+            field = terms["field"]
+            values = self.keyword_values[field]
+            codes = self.keyword_codes[field][hit_ids]
+            counts = np.bincount(codes[codes >= 0], minlength=len(values))
+            top = [c for c in np.argsort(-counts, kind="stable")[:terms.get("size", 10)] if counts[c] > 0]
+            aggregations[name] = {
+                "doc_count_error_upper_bound": 0, "sum_other_doc_count": int(counts.sum() - counts[top].sum()),
+                "buckets": [{"key": values[c], "doc_count": int(counts[c])} for c in top]
+            }
+        return aggregations
+
+    # --- suggestions and entities ---------------------------------------
+
+    def _build_completions(self, query_counts):
+        """Mirrors `queries_index`: English queries feed `suggest`, Hindi ones `suggest_hi`."""
+        entries = {"suggest": [], "suggest_hi": []}
+        for query, count in query_counts.items():
+            field = "suggest_hi" if DEVANAGARI_PATTERN.search(query) else "suggest"
+            entries[field].append((query.lower(), -int(count), query))
+        self.completions = {}
+        for field, items in entries.items():
+            items.sort()
+            self.completions[field] = ([key for key, _, _ in items], items)
+
+    def increment_query_weights(self, deltas):
+        """
+        Adds live popularity deltas ({query: count}) to the completion weights,
+        adding queries not seen before. Each field's arrays are rebuilt and
+        swapped in whole, so a concurrent `_suggest` never sees them half updated.
+        """
+        by_field = {"suggest": {}, "suggest_hi": {}}
+        for query, delta in deltas.items():
+            field = "suggest_hi" if DEVANAGARI_PATTERN.search(query) else "suggest"
+            by_field[field][query] = by_field[field].get(query, 0) + int(delta)
+        for field, field_deltas in by_field.items():
+            if not field_deltas:
+                continue
+            _, items = self.completions.get(field, ([], []))
+            updated = [(key, negative_count - field_deltas.pop(query, 0), query) for key, negative_count, query in items]
+            updated.extend((query.lower(), -delta, query) for query, delta in field_deltas.items())
+            updated.sort()
+            self.completions[field] = ([key for key, _, _ in updated], updated)
+
+    def _suggest(self, suggest):
+        response = {}
+        for name, spec in suggest.items():
+            if name == "text":
+                continue
+            completion = spec.get("completion", {})
+            prefix = str(spec.get("prefix", suggest.get("text", ""))).lower()
+            field = completion.get("field", "suggest")
+            keys, items = self.completions.get(field, ([], []))
+            lo = bisect.bisect_left(keys, prefix)
+            hi = bisect.bisect_left(keys, prefix + "\U0010ffff")
+            best = heapq.nsmallest(completion.get("size", 5), items[lo:hi], key=lambda item: (item[1], item[0]))
+            options = []
+            for _, negative_count, query in best:
+                source = {"query_text": "" if field == "suggest_hi" else query,
+                          "query_text_hi": query if field == "suggest_hi" else ""}
+                options.append({"text": query, "_index": "queries_index", "_score": float(-negative_count), "_source": source})
+            response[name] = [{"text": prefix, "offset": 0, "length": len(prefix), "options": options}]
+        return {"suggest": response}
+
+    def _entity_search(self, index, body):
+        names, prefix_indexes = self.entities[index]
+        query = body.get("query", {})
+        if "match_phrase_prefix" not in query:
+            raise ValueError(f"Unsupported query for '{index}' in the local engine: {list(query)}")
+        field, phrase = next(iter(query["match_phrase_prefix"].items()))
+        if isinstance(phrase, dict):
+            phrase = phrase.get("query", "")
+        entity_ids = prefix_indexes[field].lookup(phrase, int(body.get("size", 10)))
+        hits = [{"_index": index, "_id": str(entity_id), "_score": 1.0, "_source": names[entity_id]} for entity_id in entity_ids]
+        return {"hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": hits}}
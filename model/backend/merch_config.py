@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+
+CENTRAL_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'central_data')
+BANNER_DATA_PATH = os.path.join(CENTRAL_DATA_DIR, 'banners.json')
+VIEW_PREFERENCE_PATH = os.path.join(CENTRAL_DATA_DIR, 'view_preferences.json')
+TOP_DEPARTMENTS_PATH = os.path.join(CENTRAL_DATA_DIR, 'top_departments.json')
+RELOAD_INTERVAL_SECONDS = float(os.getenv("MERCH_RELOAD_INTERVAL", "5"))
+
+class FileWatcher:
+    """
+    Polls a set of files on a daemon thread and calls `on_change` whenever
+    any of their modification times or sizes change.
+    """
+    def __init__(self, paths, on_change, interval: float = RELOAD_INTERVAL_SECONDS):
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.interval = interval
+        self._signature = self._current_signature()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _current_signature(self):
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            signature = self._current_signature()
+            if signature != self._signature:
+                self._signature = signature
+                try:
+                    self.on_change()
+                except Exception as e:
+                    print(f"File watcher callback failed: {e}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="file-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+class MerchSnapshot:
+    """An immutable view of the merchandising config, indexed by department."""
+    __slots__ = ("banners_by_department", "view_by_department", "top_departments", "loaded_at")
+
+    def __init__(self, banners_by_department, view_by_department, top_departments):
+        self.banners_by_department = banners_by_department
+        self.view_by_department = view_by_department
+        self.top_departments = top_departments
+        self.loaded_at = time.time()
+
+class MerchConfigStore:
+    """
+    Holds banners, view preferences and top departments in dict indexes keyed
+    by department. A background watcher rebuilds the indexes when any source
+    file changes and swaps them in with a single reference assignment, so
+    readers always see one consistent snapshot.
+    """
+    def __init__(self, banner_path: str = BANNER_DATA_PATH, view_path: str = VIEW_PREFERENCE_PATH,
+                 departments_path: str = TOP_DEPARTMENTS_PATH, reload_interval: float = RELOAD_INTERVAL_SECONDS):
+        self.banner_path = banner_path
+        self.view_path = view_path
+        self.departments_path = departments_path
+        self._snapshot = self._build_snapshot(previous=None)
+        self._watcher = FileWatcher([banner_path, view_path, departments_path], self.reload, reload_interval)
+
+    def _read_json(self, path, default, previous_value):
+        """Reads a JSON file. A malformed file keeps the previous value instead of wiping it."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            print(f"Warning: '{os.path.basename(path)}' not found.")
+            return default
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"Warning: Could not parse '{os.path.basename(path)}': {e}")
+            return previous_value
+
+    def _build_snapshot(self, previous):
+        banners = self._read_json(self.banner_path, [], None)
+        banners_by_department = {}
+        if banners is None and previous is not None:
+            banners_by_department = previous.banners_by_department
+        elif isinstance(banners, list):
+            for banner in banners:
+                category = banner.get('category') if isinstance(banner, dict) else None
+                # The first banner listed for a department wins, as with the old linear scan.
+                if category and category not in banners_by_department:
+                    banners_by_department[category] = banner
+
+        view_by_department = self._read_json(self.view_path, {}, previous.view_by_department if previous else None)
+        if not isinstance(view_by_department, dict):
+            view_by_department = previous.view_by_department if previous else {}
+
+        top_departments = self._read_json(self.departments_path, [], previous.top_departments if previous else None)
+        if not isinstance(top_departments, list):
+            top_departments = previous.top_departments if previous else []
+
+        return MerchSnapshot(banners_by_department, view_by_department, top_departments)
+
+    def reload(self):
+        self._snapshot = self._build_snapshot(previous=self._snapshot)
+        print("Merchandising config reloaded.")
+
+    def start_watching(self):
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._watcher.stop()
+
+    @property
+    def snapshot(self) -> MerchSnapshot:
+        return self._snapshot
+
+    def get_banner(self, department):
+        if not department: return None
+        return self._snapshot.banners_by_department.get(department)
+
+    def get_view_preference(self, department, default: str = 'grid') -> str:
+        return self._snapshot.view_by_department.get(department, default)
+
+    @property
+    def top_departments(self):
+        return self._snapshot.top_departments
+
+merch_config = MerchConfigStore()
@@ -0,0 +1,148 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+MAX_PROFILE_SECONDS = 60
+DEFAULT_SAMPLE_INTERVAL = 0.005
+# Leaf frames in these files are threads parked on a lock, queue or socket, not doing work.
+IDLE_LEAF_FILES = ("threading.py", "queue.py", "selectors.py", os.path.join("concurrent", "futures", "thread.py"))
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is still running."""
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+class SamplingProfiler:
+    """
+    A wall-clock stack sampler. While `profile` runs, a background thread reads
+    every thread's current frame at a fixed interval and counts identical
+    stacks. Nothing runs, and nothing is hooked, when no profile is in progress.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float, interval: float = DEFAULT_SAMPLE_INTERVAL, include_idle: bool = False):
+        """Samples all threads for `seconds` and returns a Counter of root-first stack tuples."""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running.")
+        try:
+            seconds = min(max(seconds, interval), MAX_PROFILE_SECONDS)
+            stacks = Counter()
+            sampler_id = threading.get_ident()
+            thread_names = {}
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                for thread in threading.enumerate():
+                    thread_names[thread.ident] = thread.name
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == sampler_id:
+                        continue
+                    if not include_idle and frame.f_code.co_filename.endswith(IDLE_LEAF_FILES):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame))
+                        frame = frame.f_back
+                    stack.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+                    stacks[tuple(reversed(stack))] += 1
+                time.sleep(interval)
+            return stacks
+        finally:
+            self._lock.release()
+
+def to_collapsed(stacks) -> str:
+    """Brendan Gregg's collapsed-stack format, as consumed by flamegraph.pl and speedscope."""
+    return "\n".join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common()) + "\n"
+
+def to_speedscope(stacks, interval: float, name: str = "search-backend") -> dict:
+    frames, frame_index, samples, weights = [], {}, [], []
+    for stack, count in stacks.most_common():
+        indexes = []
+        for label in stack:
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({"name": label})
+            indexes.append(frame_index[label])
+        samples.append(indexes)
+        weights.append(count * interval)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled", "name": name, "unit": "seconds",
+            "startValue": 0, "endValue": sum(weights),
+            "samples": samples, "weights": weights
+        }],
+        "name": name,
+        "exporter": "gridbyte-sampling-profiler"
+    }
+
+class AllocationTracker:
+    """
+    Wraps tracemalloc so allocation growth can be compared between two points
+    in time, e.g. before and after a batch of /search requests. Tracing is
+    only switched on by `start` and fully off again after `stop`.
+    """
+    def __init__(self):
+        self._baseline = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._baseline = self._take_snapshot()
+
+    def stop(self):
+        with self._lock:
+            self._baseline = None
+            tracemalloc.stop()
+
+    def _take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def diff(self, top: int = 25, key_type: str = "lineno", filename_filter: str = None):
+        """
+        Compares a fresh snapshot with the previous one, makes it the new
+        baseline and returns the `top` entries by size growth.
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing() or self._baseline is None:
+                raise RuntimeError("Allocation tracking is not running; start it first.")
+            snapshot = self._take_snapshot()
+            if filename_filter:
+                snapshot = snapshot.filter_traces((tracemalloc.Filter(True, f"*{filename_filter}*"),))
+                baseline = self._baseline.filter_traces((tracemalloc.Filter(True, f"*{filename_filter}*"),))
+            else:
+                baseline = self._baseline
+            stats = snapshot.compare_to(baseline, key_type)
+            self._baseline = self._take_snapshot()
+
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "top": [{
+                "location": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                "size_diff_bytes": stat.size_diff,
+                "size_bytes": stat.size,
+                "count_diff": stat.count_diff,
+                "count": stat.count
+            } for stat in stats[:top]]
+        }
+
+sampling_profiler = SamplingProfiler()
+allocation_tracker = AllocationTracker()
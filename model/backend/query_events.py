@@ -0,0 +1,164 @@
+import fcntl
+import os
+import threading
+import time
+from collections import Counter, deque
+
+from elasticsearch.helpers import bulk
+
+from query_popularity import LIVE_QUERY_LOG_PATH
+from query_understanding import detect_language, query_doc_id
+
+QUERY_EVENT_LOG_PATH = LIVE_QUERY_LOG_PATH
+QUERY_EVENTS_ENABLED = os.getenv("QUERY_EVENTS_ENABLED", "1") != "0"
+POPULARITY_FLUSH_INTERVAL = float(os.getenv("POPULARITY_FLUSH_INTERVAL", "30"))
+# Events beyond this many unflushed ones are dropped (and counted) rather than growing memory.
+MAX_PENDING_EVENTS = int(os.getenv("QUERY_EVENT_MAX_PENDING", "100000"))
+QUERIES_INDEX = "queries_index"
+
+# Adds the delta to an existing suggestion; the upsert below creates a query never indexed before.
+WEIGHT_UPDATE_SCRIPT = "ctx._source[params.field].weight += params.delta"
+
+def _csv_field(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+def suggestion_update_actions(deltas, index: str = QUERIES_INDEX):
+    """Bulk partial updates for `queries_index`, in the document shape index_multilingual_queries.py writes."""
+    for query_text, delta in deltas.items():
+        is_hindi = detect_language(query_text) == 'hi'
+        field = "suggest_hi" if is_hindi else "suggest"
+        yield {
+            "_op_type": "update",
+            "_index": index,
+            "_id": query_doc_id(query_text),
+            "script": {"source": WEIGHT_UPDATE_SCRIPT, "params": {"field": field, "delta": delta}},
+            "upsert": {
+                "query_text": "" if is_hindi else query_text,
+                "query_text_hi": query_text if is_hindi else "",
+                "suggest": {"input": [] if is_hindi else query_text, "weight": delta},
+                "suggest_hi": {"input": query_text if is_hindi else [], "weight": delta}
+            }
+        }
+
+class PopularityUpdater:
+    """
+    Collects search queries from live traffic and, every `interval` seconds
+    on a daemon thread, appends them to an append-only event log and pushes
+    the per-query count deltas to the suggestion store: bulk partial updates
+    against `queries_index`, or in-place weight updates when the backend is
+    the in-process local engine. Recording is a deque append, so the request
+    path never waits on disk or Elasticsearch.
+    """
+    def __init__(self, log_path: str = QUERY_EVENT_LOG_PATH, interval: float = POPULARITY_FLUSH_INTERVAL,
+                 max_pending: int = MAX_PENDING_EVENTS):
+        self.log_path = log_path
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.client = None
+        self.recorded = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.update_errors = 0
+
+    def record(self, query_text: str):
+        if not query_text:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append((time.time(), query_text))
+        self.recorded += 1
+
+    def _drain(self):
+        events = []
+        while True:
+            try:
+                events.append(self._pending.popleft())
+            except IndexError:
+                return events
+
+    def flush(self):
+        """Writes and applies every pending event. Returns the number of events flushed."""
+        with self._flush_lock:
+            events = self._drain()
+            if not events:
+                return 0
+            self._append_to_log(events)
+            deltas = Counter(query_text for _, query_text in events)
+            try:
+                self._apply(deltas)
+            except Exception as e:
+                self.update_errors += 1
+                print(f"Could not push {len(deltas)} suggestion weight updates: {e}")
+            self.flushed += len(events)
+            return len(events)
+
+    def _append_to_log(self, events):
+        """
+        Appends the events as one write under an exclusive lock, since every
+        worker serve.py forks appends to the same file: the header check and
+        the rows cannot interleave with another worker's.
+        """
+        # ISO-8601 UTC, which QueryPopularity.update_from_logs reads as event times.
+        lines = "".join(f"{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts))},{_csv_field(query_text)}\n"
+                        for ts, query_text in events)
+        fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size == 0:
+                lines = "timestamp,search_query\n" + lines
+            data = memoryview(lines.encode('utf-8'))
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            # Closing releases the lock.
+            os.close(fd)
+
+    def _apply(self, deltas):
+        if self.client is None:
+            return
+        if hasattr(self.client, "increment_query_weights"):
+            self.client.increment_query_weights(deltas)
+            return
+        _, errors = bulk(self.client, suggestion_update_actions(deltas), raise_on_error=False, refresh=False)
+        if errors:
+            self.update_errors += len(errors)
+            print(f"{len(errors)} suggestion weight updates failed, e.g. {errors[0]}")
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Popularity updater flush failed: {e}")
+
+    def start(self, client):
+        self.client = client
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="popularity-updater", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the worker and flushes what is left, so a clean shutdown loses no events."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Final popularity flush failed: {e}")
+
+    def stats(self):
+        return {
+            "pending": len(self._pending), "recorded": self.recorded, "dropped": self.dropped,
+            "flushed": self.flushed, "update_errors": self.update_errors
+        }
+
+popularity_updater = PopularityUpdater()
@@ -0,0 +1,205 @@
+import hashlib
+import io
+import json
+import math
+import os
+import time
+
+import pandas as pd
+
+CENTRAL_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'central_data')
+QUERY_LOG_PATH = os.path.join(CENTRAL_DATA_DIR, 'query_product_log.csv')
+POPULARITY_STATE_PATH = os.path.join(CENTRAL_DATA_DIR, 'query_popularity.json')
+# Written by the API's popularity updater (query_events.py) from live /search traffic.
+LIVE_QUERY_LOG_PATH = os.getenv("QUERY_EVENT_LOG_PATH", os.path.join(CENTRAL_DATA_DIR, 'live_query_log.csv'))
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "14"))
+# Distinct queries kept. Counts are exact until the log has more distinct queries than this.
+POPULARITY_CAPACITY = int(os.getenv("POPULARITY_CAPACITY", "100000"))
+LOG_CHUNK_BYTES = 8 << 20
+HEAD_BYTES = 64 << 10
+# Forward-decay weights grow as exp(rate * age); rebase before they lose float precision.
+MAX_EXPONENT = 50.0
+
+class QueryPopularity:
+    """
+    Time-decayed query counts, built incrementally from the query log.
+
+    Uses forward decay: an event at time t adds exp(rate * (t - landmark)),
+    so older totals never need rescaling on update. The decayed weight at
+    `now` is the stored total times exp(-rate * (now - landmark)). Memory is
+    bounded to `capacity` queries with Space-Saving: once the table is full,
+    a query not in it starts from the smallest tracked count, which it also
+    records as its error, and the lightest queries are dropped after each
+    batch. A count then over-reports its query by at most its `errors`
+    entry, and an untracked query weighs no more than the smallest count.
+    """
+    def __init__(self, half_life_days: float = POPULARITY_HALF_LIFE_DAYS, capacity: int = POPULARITY_CAPACITY,
+                 landmark: float = None, counts=None, errors=None, logs=None):
+        self.half_life_days = half_life_days
+        self.rate = math.log(2) / (half_life_days * 86400)
+        self.capacity = capacity
+        self.landmark = time.time() if landmark is None else landmark
+        self.counts = pd.Series(counts or {}, dtype=float)
+        # Only queries that entered a full table have an entry.
+        self.errors = pd.Series(errors or {}, dtype=float)
+        # Where the last update stopped reading each log: {path: {"offset", "head", "columns"}}.
+        self.logs = logs or {}
+
+    def add(self, queries, at: float = None):
+        """Adds one occurrence per query in `queries` (or a Series of counts indexed by query) at time `at`, default now."""
+        counts = queries if isinstance(queries, pd.Series) else pd.Series(queries, dtype=object).value_counts()
+        if counts.empty:
+            return
+        at = time.time() if at is None else at
+        if self.rate * (at - self.landmark) > MAX_EXPONENT:
+            self._rebase(at)
+        self._merge(counts.astype(float) * math.exp(self.rate * (at - self.landmark)))
+
+    def _add_timed(self, queries: pd.Series, timestamps: pd.Series):
+        """Adds queries with their own event times (epoch seconds)."""
+        latest = float(timestamps.max())
+        if self.rate * (latest - self.landmark) > MAX_EXPONENT:
+            self._rebase(latest)
+        factors = ((timestamps - self.landmark) * self.rate).clip(upper=MAX_EXPONENT).map(math.exp)
+        self._merge(factors.groupby(queries.values).sum())
+
+    def _merge(self, weights: pd.Series):
+        """Adds a batch of weights (in landmark units) as one Space-Saving merge."""
+        if len(self.counts) >= self.capacity:
+            # Anything dropped so far weighed at most the current minimum.
+            floor = float(self.counts.min())
+            new = weights.index.difference(self.counts.index)
+            if floor > 0 and len(new):
+                weights = weights.add(pd.Series(floor, index=new), fill_value=0.0)
+                self.errors = pd.concat([self.errors, pd.Series(floor, index=new)])
+        self.counts = self.counts.add(weights, fill_value=0.0)
+        if len(self.counts) > self.capacity:
+            self.counts = self.counts.nlargest(self.capacity)
+            self.errors = self.errors[self.errors.index.isin(self.counts.index)]
+
+    @property
+    def max_error(self) -> float:
+        """The largest amount any tracked count may over-report its query by, in landmark units."""
+        return float(self.errors.max()) if len(self.errors) else 0.0
+
+    def _rebase(self, landmark: float):
+        scale = math.exp(-self.rate * (landmark - self.landmark))
+        self.counts *= scale
+        self.errors *= scale
+        self.landmark = landmark
+
+    def weights(self, now: float = None) -> pd.Series:
+        """Decayed weights as of `now`, heaviest first."""
+        now = time.time() if now is None else now
+        return (self.counts * math.exp(-self.rate * (now - self.landmark))).sort_values(ascending=False)
+
+    def integer_weights(self, now: float = None) -> pd.Series:
+        """Weights rounded up to positive integers, as completion suggesters and the trie expect."""
+        return self.weights(now).map(math.ceil).clip(lower=1).astype(int)
+
+    def update_from_logs(self, log_paths) -> int:
+        """
+        Reads the lines appended to each log since the last update and returns
+        how many rows were added; a log that does not exist is skipped. When
+        any log was rewritten (its first bytes changed or it shrank), the
+        counts are reset and every log is re-read from the start.
+        """
+        paths = [os.path.abspath(path) for path in log_paths if os.path.exists(path)]
+        if any(self._was_rewritten(path) for path in paths):
+            print("Query log was rewritten; recounting from the start.")
+            self.counts = pd.Series(dtype=float)
+            self.errors = pd.Series(dtype=float)
+            self.logs = {}
+        return sum(self._read_new_lines(path) for path in paths)
+
+    def _was_rewritten(self, path: str) -> bool:
+        read = self.logs.get(path)
+        if not read:
+            return False
+        with open(path, 'rb') as f:
+            # Only the already-read prefix is compared, so appends do not look like a rewrite.
+            head = hashlib.sha1(f.read(min(read["offset"], HEAD_BYTES))).hexdigest()
+            return read["offset"] > os.fstat(f.fileno()).st_size or read["head"] != head
+
+    def _read_new_lines(self, path: str) -> int:
+        read = self.logs.get(path)
+        with open(path, 'rb') as f:
+            if read:
+                columns = read["columns"]
+                f.seek(read["offset"])
+            else:
+                columns = f.readline().decode('utf-8').strip().split(',')
+
+            rows = 0
+            while True:
+                lines = f.readlines(LOG_CHUNK_BYTES)
+                if lines and not lines[-1].endswith(b'\n'):
+                    # A line still being appended; leave it for the next update.
+                    f.seek(-len(lines[-1]), os.SEEK_CUR)
+                    lines.pop()
+                if not lines:
+                    break
+                chunk = pd.read_csv(io.BytesIO(b''.join(lines)), names=columns, header=None)
+                chunk = chunk.dropna(subset=['search_query'])
+                queries = chunk['search_query'].astype(str)
+                if 'timestamp' in chunk.columns:
+                    timestamps = pd.to_datetime(chunk['timestamp'], errors='coerce', utc=True)
+                    # Seconds since the epoch, independent of the datetime resolution pandas picked.
+                    seconds = (timestamps - pd.Timestamp(0, tz='UTC')).dt.total_seconds()
+                    self._add_timed(queries, seconds.where(timestamps.notna(), time.time()))
+                else:
+                    # The log carries no event times, so lines count as of when they are ingested.
+                    self.add(queries.value_counts())
+                rows += len(chunk)
+            offset = f.tell()
+            f.seek(0)
+            head = hashlib.sha1(f.read(min(offset, HEAD_BYTES))).hexdigest()
+
+        self.logs[path] = {"offset": offset, "head": head, "columns": columns}
+        return rows
+
+    def to_dict(self) -> dict:
+        return {
+            "half_life_days": self.half_life_days, "capacity": self.capacity, "landmark": self.landmark,
+            "logs": self.logs, "counts": self.counts.to_dict(), "errors": self.errors.to_dict()
+        }
+
+    def save(self, path: str = POPULARITY_STATE_PATH):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = POPULARITY_STATE_PATH, half_life_days: float = POPULARITY_HALF_LIFE_DAYS,
+             capacity: int = POPULARITY_CAPACITY):
+        """Loads saved state; a missing file, or one saved with a different half-life, starts fresh."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls(half_life_days, capacity)
+        if state.get("half_life_days") != half_life_days:
+            return cls(half_life_days, capacity)
+        logs = state.get("logs")
+        if logs is None and state.get("log"):
+            # Saved before several logs were tracked.
+            log = dict(state["log"])
+            logs = {log.pop("path"): log}
+        popularity = cls(half_life_days, capacity, state["landmark"], state["counts"], state.get("errors"), logs)
+        if len(popularity.counts) > capacity:
+            popularity._merge(pd.Series(dtype=float))
+        return popularity
+
+def refresh_query_popularity(log_path: str = QUERY_LOG_PATH, state_path: str = POPULARITY_STATE_PATH,
+                             live_log_path: str = LIVE_QUERY_LOG_PATH) -> QueryPopularity:
+    """
+    Loads the saved aggregate, folds in the new lines of the query log and of
+    the API's live query log, and saves it again, so a rebuilt index keeps
+    the weight live traffic gave it.
+    """
+    popularity = QueryPopularity.load(state_path)
+    rows = popularity.update_from_logs([log_path, live_log_path])
+    popularity.save(state_path)
+    print(f"Query popularity: {rows} new log rows, {len(popularity.counts)} distinct queries tracked.")
+    return popularity
@@ -0,0 +1,59 @@
+import hashlib
+import os
+import unicodedata
+from functools import lru_cache
+
+import regex as re
+
+HINDI_PATTERN = re.compile(r'[\p{Devanagari}]')
+PARSE_CACHE_SIZE = int(os.getenv("QUERY_PARSE_CACHE_SIZE", "8192"))
+
+def normalize_text(text: str) -> str:
+    """NFC-normalizes, lowercases and collapses whitespace so equivalent queries compare equal."""
+    return " ".join(unicodedata.normalize("NFC", text).lower().split())
+
+def query_doc_id(text: str) -> str:
+    """Stable `queries_index` document id for a query, so live weight updates can address it."""
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+def detect_language(text) -> str:
+    """'hi' if the text contains Devanagari characters, otherwise 'en'."""
+    if isinstance(text, str) and HINDI_PATTERN.search(text):
+        return 'hi'
+    return 'en'
+
+class ParsedQuery:
+    """
+    The result of query understanding: the raw user input, its normalized
+    text and detected language. Immutable and hashable, so one instance can
+    be handed to every stage of a request and used directly in cache keys.
+    """
+    __slots__ = ("raw", "text", "lang")
+
+    def __init__(self, raw: str, text: str, lang: str):
+        object.__setattr__(self, "raw", raw)
+        object.__setattr__(self, "text", text)
+        object.__setattr__(self, "lang", lang)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, ParsedQuery):
+            return NotImplemented
+        return self.text == other.text and self.lang == other.lang
+
+    def __hash__(self):
+        return hash((self.text, self.lang))
+
+    def __repr__(self):
+        return f"ParsedQuery(text={self.text!r}, lang={self.lang!r})"
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_query(raw: str) -> ParsedQuery:
+    """Normalizes the query and detects its language once; repeated inputs are served from the cache."""
+    text = normalize_text(raw)
+    return ParsedQuery(raw, text, detect_language(text))
@@ -0,0 +1,75 @@
+import hashlib
+import os
+
+import orjson
+from fastapi.responses import Response
+
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# What a search result card renders (GridView, ListView and the client-side filters and sorts).
+SEARCH_CARD_FIELDS = frozenset({
+    "asin", "title", "images", "rating", "rating_count", "reviews_count", "final_price", "discount_percentage",
+    "isAvailable", "department", "bought_past_month", "description", "product_specifications"
+})
+
+def _default(value):
+    # NumPy and pandas scalars that OPT_SERIALIZE_NUMPY does not cover, e.g. inside object columns.
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+class ORJSONResponse(Response):
+    """
+    JSON rendered by orjson. Endpoints on the hot path return it directly so
+    FastAPI skips its `jsonable_encoder` pass over the payload. NaN values,
+    which pandas leaves in product fields, are written as null.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def parse_fields(fields, default=None):
+    """
+    A comma-separated `fields` parameter as a set of field names; `default`
+    when it is not given, and None (no projection) for `fields=all`.
+    """
+    if not fields:
+        return default
+    if fields.strip() == "all":
+        return None
+    return frozenset(f.strip() for f in fields.split(",") if f.strip()) | {"asin"}
+
+def project(document: dict, fields) -> dict:
+    if fields is None:
+        return document
+    return {key: value for key, value in document.items() if key in fields}
+
+def project_page(page_content, fields):
+    """Projects the product entries of a blended results page; ads and banners are passed through."""
+    if fields is None:
+        return page_content
+    return [{"type": "product", "data": project(item["data"], fields)} if item["type"] == "product" else item
+            for item in page_content]
+
+def cached_json_response(content, if_none_match: str = None, max_age: int = 60) -> Response:
+    """
+    Renders `content` with a weak ETag over the body and a Cache-Control
+    max-age. A request whose If-None-Match carries that ETag gets an empty
+    304. The tag is weak because the gzip layer may re-encode the body.
+    """
+    body = dumps(content)
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    # If-None-Match uses weak comparison, so a client echoing the tag without W/ still matches.
+    sent = {tag.strip().removeprefix("W/") for tag in (if_none_match or "").split(",")}
+    if "*" in sent or etag.removeprefix("W/") in sent:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
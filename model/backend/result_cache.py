@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from query_understanding import ParsedQuery, normalize_text
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+SEARCH_CACHE_STALE_TTL = float(os.getenv("SEARCH_CACHE_STALE_TTL", "0"))
+
+class TTLCache:
+    """
+    A thread-safe, size-bounded LRU cache whose entries expire after `ttl`
+    seconds. When `stale_ttl` is positive, an expired entry is still served
+    for that many extra seconds while a background refresh recomputes it
+    (stale-while-revalidate).
+    """
+    def __init__(self, max_size: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL,
+                 stale_ttl: float = SEARCH_CACHE_STALE_TTL, name: str = "cache"):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_pool = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+
+    def _lookup(self, key, now):
+        """Returns (value, state) where state is 'fresh', 'stale' or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        value, expires_at = entry
+        if now < expires_at:
+            self._entries.move_to_end(key)
+            return value, 'fresh'
+        if now < expires_at + self.stale_ttl:
+            self._entries.move_to_end(key)
+            return value, 'stale'
+        del self._entries[key]
+        return None, None
+
+    def get(self, key):
+        with self._lock:
+            value, state = self._lookup(key, time.monotonic())
+            if state == 'fresh':
+                self.hits += 1
+            elif state == 'stale':
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+            return value if state else None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for `key`, computing and storing it on a miss."""
+        with self._lock:
+            value, state = self._lookup(key, time.monotonic())
+            if state == 'fresh':
+                self.hits += 1
+                return value
+            if state == 'stale':
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    self._schedule_refresh(key, compute)
+                return value
+            self.misses += 1
+
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def _schedule_refresh(self, key, compute):
+        if self._refresh_pool is None:
+            self._refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"{self.name}-refresh")
+        self._refresh_pool.submit(self._refresh, key, compute)
+
+    def _refresh(self, key, compute):
+        try:
+            self.set(key, compute())
+        except Exception as e:
+            self.refresh_errors += 1
+            print(f"Background refresh failed for {self.name}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refresh_errors": self.refresh_errors,
+                "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            }
+
+def normalize_query(text: str) -> str:
+    """Normalizes the way query understanding does, so equivalent queries share a cache key."""
+    return normalize_text(text)
+
+def make_search_cache_key(query: ParsedQuery, discount=0, price_range=None, ratings=0):
+    price_key = tuple(None if bound is None else float(bound) for bound in price_range) if price_range else None
+    return (query.text, query.lang, float(discount or 0), price_key, float(ratings or 0))
@@ -0,0 +1,41 @@
+FACET_AGGS = {
+    "brands": {"terms": {"field": "brand", "size": 10}},
+    "departments": {"terms": {"field": "department", "size": 10}}
+}
+
+def build_filters(discount=0, price_range=None, ratings=0):
+    filters = []
+    if discount > 0: filters.append({"range": {"discount_percentage": {"gte": discount}}})
+    if price_range:
+        price_filter = {}
+        if price_range[0] is not None: price_filter["gte"] = price_range[0]
+        if price_range[1] is not None: price_filter["lte"] = price_range[1]
+        filters.append({"range": {"final_price": price_filter}})
+    if ratings > 0: filters.append({"range": {"rating": {"gte": ratings}}})
+    return filters
+
+def language_fields(lang: str):
+    """Returns the (title, description) fields to search for a language."""
+    if lang == 'hi':
+        return "title_hi", "description_hi"
+    return "title", "description"
+
+def build_text_query(user_query: str, lang: str, filters):
+    title_field, description_field = language_fields(lang)
+    return {"bool": {"must": {"multi_match": {"query": user_query, "fields": [f"{title_field}^3", f"{description_field}^2", "brand", "product_specifications.value"], "fuzziness": "AUTO"}}, "filter": filters}}
+
+def build_knn(query_vector, k: int, num_candidates: int, filters):
+    return {"field": "embedding", "query_vector": query_vector, "k": k, "num_candidates": num_candidates, "filter": filters}
+
+def build_facet_query(user_query: str, lang: str, query_vector, filters, k: int, num_candidates: int):
+    """An aggregation-only request over the same hybrid candidate set the first results page uses."""
+    return {
+        "size": 0,
+        "query": build_text_query(user_query, lang, filters),
+        "knn": build_knn(query_vector, k, num_candidates, filters),
+        "aggs": FACET_AGGS
+    }
+
+def parse_facets(response):
+    aggregations = response.get('aggregations', {})
+    return {name: aggregations.get(name, {}).get('buckets', []) for name in FACET_AGGS}
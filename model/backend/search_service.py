@@ -1,69 +1,135 @@
-from elasticsearch import Elasticsearch
+from elasticsearch import NotFoundError
 from sentence_transformers import SentenceTransformer, util
 import pandas as pd
 import numpy as np
 import os
 import json
+import base64
+import random
+import hashlib
 from collections import Counter
-import regex as re
+from functools import lru_cache
+from merch_config import merch_config
+from es_client import get_es_client, ES_SEARCH_TIMEOUT
+from metrics import stage_timer, run_in_request_context
+from result_cache import TTLCache, make_search_cache_key
+from shared_cache import query_embedding_cache
+from query_understanding import ParsedQuery, parse_query
+from search_queries import build_filters, build_text_query, build_knn, build_facet_query, language_fields, parse_facets
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 
+EMBEDDING_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
 AD_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'advertisement_dataset.csv')
-BANNER_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'banners.json')
+KNN_CANDIDATES_MULTIPLIER = float(os.getenv("KNN_CANDIDATES_MULTIPLIER", "2"))
+MAX_KNN_CANDIDATES = 10000
+# kNN k for a whole cursor session. Every page must send the same hybrid query, or scores (and so the
+# search_after positions) shift between hops; hits below this depth are ranked by text alone.
+KNN_PAGINATION_DEPTH = int(os.getenv("SEARCH_KNN_DEPTH", "200"))
+# index.max_result_window: ES rejects from + size beyond this.
+MAX_RESULT_WINDOW = 10000
+PIT_KEEP_ALIVE = os.getenv("SEARCH_PIT_KEEP_ALIVE", "2m")
+PRECOMPUTED_FACETS_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'precomputed_facets.json')
+FACET_KNN_K = int(os.getenv("FACET_KNN_K", "100"))
+FACET_WORKERS = int(os.getenv("FACET_WORKERS", "8"))
+FACET_CACHE_TTL = float(os.getenv("FACET_CACHE_TTL", "900"))
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "2048"))
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", "60"))
+PRODUCT_SOURCE_EXCLUDES = ["embedding"]
+
+@lru_cache(maxsize=None)
+def load_ads_table(path: str = AD_DATA_PATH):
+    """
+    The ads as an Arrow table: one flat buffer per column instead of a Python
+    object per cell, so scanning it does not write refcounts into pages a
+    preloading master shares with its forked workers. Loaded once per
+    process; a missing file is not cached.
+    """
+    return pa_csv.read_csv(path)
+
+class ProductLookupError(Exception):
+    """Raised when the product store cannot be reached, as opposed to a product not existing."""
+
+def encode_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode()).decode()
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def decode_cursor(cursor: str, page_size: int) -> dict:
+    """
+    The page state in a cursor. Anything ES would reject (an offset outside
+    the result window, a malformed `after`) raises ValueError, so the client
+    gets a 400 rather than a failed search.
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Malformed pagination cursor.")
+    if not isinstance(state, dict):
+        raise ValueError("Malformed pagination cursor.")
+    offset, after, pit = state.get("offset"), state.get("after"), state.get("pit")
+    if not _is_int(offset) or offset < 0:
+        raise ValueError("Malformed pagination cursor.")
+    if offset > MAX_RESULT_WINDOW - page_size:
+        raise ValueError(f"Pagination cursor is past the first {MAX_RESULT_WINDOW} results.")
+    if after is not None and not (isinstance(after, list) and after
+                                  and all(isinstance(v, (str, int, float)) for v in after)):
+        raise ValueError("Malformed pagination cursor.")
+    if pit is not None and not isinstance(pit, str):
+        raise ValueError("Malformed pagination cursor.")
+    # Cursors issued before the kNN depth was carried get the current default.
+    state.setdefault("k", min(max(page_size, KNN_PAGINATION_DEPTH), MAX_KNN_CANDIDATES))
+    state.setdefault("nc", min(max(int(state["k"] * KNN_CANDIDATES_MULTIPLIER), state["k"]), MAX_KNN_CANDIDATES))
+    if not (_is_int(state["k"]) and _is_int(state["nc"]) and 1 <= state["k"] <= state["nc"] <= MAX_KNN_CANDIDATES):
+        raise ValueError("Malformed pagination cursor.")
+    return state
+
+def query_fingerprint(cache_key) -> str:
+    """A short, process-independent hash that ties a cursor to the query it was issued for."""
+    return hashlib.sha1(repr(cache_key).encode('utf-8')).hexdigest()[:16]
 
 class SearchService:
-    def __init__(self):
+    def __init__(self, es_client=None, embedding_model=None):
         print("Initializing Search Service...")
-        self.es_client = Elasticsearch("http://localhost:9200")
-        if not self.es_client.ping():
-            raise ConnectionError("Could not connect to Elasticsearch")
-        
-        self.hindi_pattern = re.compile(r'[\p{Devanagari}]')
-        self.embedding_model = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
-
-        self.category_view_map = {
-            "Clothing": "grid", "Jewellery": "grid", "Footwear": "grid",
-            "Home Decor & Festive Needs": "grid", "Beauty and Personal Care": "grid",
-            "Home Furnishing": "grid", "Kitchen & Dining": "grid", "Watches": "grid",
-            "Baby Care": "grid", "Toys & School Supplies": "grid", "Pens & Stationery": "grid",
-            "Bags, Wallets & Belts": "grid", "Furniture": "grid", "Sports & Fitness": "grid",
-            "Sunglasses": "grid", "Pet Supplies": "grid", "Home & Kitchen": "grid",
-            "Eyewear": "grid", "Mobiles & Accessories": "grid",
-            "Automotive": "list", "Computers": "list", "Tools & Hardware": "list",
-            "Home Improvement": "list", "Cameras & Accessories": "list",
-            "Health & Personal Care Appliances": "list", "Gaming": "list",
-            "Home Entertainment": "list", "eBooks": "list"
-        }
+        self.es_client = (es_client or get_es_client()).options(request_timeout=ES_SEARCH_TIMEOUT)
+        self.embedding_model = embedding_model or SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+        self.merch_config = merch_config
+        self.result_cache = TTLCache(name="search_results")
+        self.facet_cache = TTLCache(ttl=FACET_CACHE_TTL, name="facets")
+        self.embedding_cache = query_embedding_cache()
+        self.product_cache = TTLCache(max_size=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL, name="products")
+        self.facet_pool = ThreadPoolExecutor(max_workers=FACET_WORKERS, thread_name_prefix="facets")
 
         try:
-            self.ads_df = pd.read_csv(AD_DATA_PATH)
-            print("Advertisement dataset loaded successfully.")
+            with open(PRECOMPUTED_FACETS_PATH, 'r', encoding='utf-8') as f:
+                self.precomputed_facets = json.load(f).get("facets", {})
+            print(f"Loaded precomputed facets for {len(self.precomputed_facets)} head queries.")
         except FileNotFoundError:
-            self.ads_df = None
-            print("Warning: Advertisement dataset not found. No ads will be shown.")
+            self.precomputed_facets = {}
+
         try:
-            with open(BANNER_DATA_PATH, 'r') as f:
-                self.banners = json.load(f)
-            print("Banners loaded successfully.")
+            self.ads_table = load_ads_table()
+            print("Advertisement dataset loaded successfully.")
         except FileNotFoundError:
-            self.banners = []
-            print("Warning: Banners not found.")
+            self.ads_table = None
+            print("Warning: Advertisement dataset not found. No ads will be shown.")
         print("Search Service Initialized Successfully.")
 
-    def detect_language(self, text: str) -> str:
-        if self.hindi_pattern.search(text):
-            return 'hi'
-        return 'en'
+    def close(self):
+        self.facet_pool.shutdown(wait=False, cancel_futures=True)
 
     def get_relevant_ads(self, dominant_category, num_ads=2):
-        if self.ads_df is None or self.ads_df.empty or not dominant_category: return []
-        relevant_ads = self.ads_df[self.ads_df['category'].str.contains(dominant_category, case=False, na=False)]
-        return relevant_ads.sample(min(num_ads, len(relevant_ads))).to_dict(orient='records')
+        if self.ads_table is None or self.ads_table.num_rows == 0 or not dominant_category: return []
+        matches = pc.match_substring(self.ads_table['category'], dominant_category, ignore_case=True)
+        rows = np.flatnonzero(matches.fill_null(False).to_numpy(zero_copy_only=False))
+        if not len(rows): return []
+        return self.ads_table.take(random.sample(rows.tolist(), min(num_ads, len(rows)))).to_pylist()
 
     def get_relevant_banner(self, dominant_category):
-        if not self.banners or not dominant_category: return None
-        for banner in self.banners:
-            if banner.get('category') == dominant_category: return banner
-        return None
+        return self.merch_config.get_banner(dominant_category)
 
     def blend_results(self, products, ads, banner):
         final_page, product_idx, ad_idx = [], 0, 0
@@ -78,46 +144,229 @@ class SearchService:
     
     def get_product_by_asin(self, asin: str):
         """
-        Retrieves a single product document from Elasticsearch by its ASIN (ID).
+        Retrieves a single product document by its ASIN (ID), or None if it does not exist.
+        """
+        return self.get_products_by_asins([asin]).get(asin)
+
+    def get_products_by_asins(self, asins, fields=None):
+        """
+        Retrieves many products in one `_mget` round trip, serving hot products
+        from an in-process LRU. Returns a dict of ASIN -> product for the ASINs
+        that exist; unknown ASINs are simply absent. When `fields` is given,
+        each product is projected to those fields (plus `asin`).
+        """
+        products, missing = {}, []
+        for asin in dict.fromkeys(asins):
+            cached = self.product_cache.get(asin)
+            if cached is not None:
+                products[asin] = cached
+            else:
+                missing.append(asin)
+
+        if missing:
+            try:
+                with stage_timer("es_mget"):
+                    response = self.es_client.mget(index="products_index", ids=missing, _source_excludes=PRODUCT_SOURCE_EXCLUDES)
+            except Exception as e:
+                raise ProductLookupError(f"Could not fetch products: {e}") from e
+            for doc in response['docs']:
+                if not doc.get('found'):
+                    continue
+                product_data = doc['_source']
+                product_data['asin'] = doc['_id']
+                self.product_cache.set(doc['_id'], product_data)
+                products[doc['_id']] = product_data
+
+        if fields:
+            wanted = set(fields) | {'asin'}
+            products = {asin: {k: v for k, v in product.items() if k in wanted} for asin, product in products.items()}
+        return products
+
+    def encode_query(self, query_text: str):
+        return self.embedding_cache.get_or_compute(query_text, lambda: self._encode(query_text))
+
+    def _encode(self, query_text: str):
+        with stage_timer("embed"):
+            return self.embedding_model.encode(query_text, normalize_embeddings=True)
+
+    def get_facets(self, user_query: str, discount: int = 0, price_range=None, ratings: int = 0):
+        """
+        Returns brand and department facets for a query and filter set, served
+        from the facet cache, then the offline precomputed head-query facets,
+        then a size-0 aggregation request.
         """
+        if not user_query:
+            return {}
+        return self._get_facets(parse_query(user_query), discount, price_range, ratings)
+
+    def _get_facets(self, query: ParsedQuery, discount: int = 0, price_range=None, ratings: int = 0, query_embedding=None):
+        cache_key = make_search_cache_key(query, discount, price_range, ratings)
+        return self.facet_cache.get_or_compute(
+            cache_key, lambda: self._fetch_facets(query.text, query.lang, discount, price_range, ratings, query_embedding)
+        )
+
+    def _fetch_facets(self, query_text: str, lang: str, discount: int = 0, price_range=None, ratings: int = 0,
+                      query_embedding=None):
+        unfiltered = not discount and not price_range and not ratings
+        if unfiltered and query_text in self.precomputed_facets:
+            return self.precomputed_facets[query_text]
+
+        if query_embedding is None:
+            query_embedding = self.encode_query(query_text)
+        filters = build_filters(discount, price_range, ratings)
+        es_query = build_facet_query(query_text, lang, query_embedding, filters,
+                                     FACET_KNN_K, int(FACET_KNN_K * KNN_CANDIDATES_MULTIPLIER))
+        with stage_timer("es_facets"):
+            response = self.es_client.search(index="products_index", body=es_query)
+        return parse_facets(response)
+
+    def search_products(self, user_query: str, limit: int = 40, discount: int = 0, price_range=None, ratings: int = 0,
+                        cursor: str = None, include_facets: bool = True):
+        """
+        Returns one page of results. `limit` is the page size; pass the returned
+        `next_cursor` back as `cursor` to fetch the following page. Facets are
+        fetched by a concurrent sub-request; with `include_facets=False` they
+        are left out so the page can be painted first and facets loaded from
+        `get_facets` separately.
+        """
+        if not user_query:
+            return {"page_content": [], "facets": {}, "view_preference": "grid", "next_cursor": None}
+
+        with stage_timer("parse_query"):
+            query = parse_query(user_query)
+        cache_key = make_search_cache_key(query, discount, price_range, ratings)
+        fingerprint = query_fingerprint(cache_key)
+        # Encoded once here for both the facet sub-request and the hits; the cache does not coalesce concurrent misses.
+        query_embedding = self.encode_query(query.text)
+
+        # Facets do not change between pages, so they are only returned with the first one.
+        facets_future = None
+        if include_facets and cursor is None:
+            facets_future = self.facet_pool.submit(
+                run_in_request_context(self._get_facets, query, discount, price_range, ratings, query_embedding)
+            )
+
+        if cursor is None:
+            organic = self.result_cache.get_or_compute(
+                cache_key + (limit,),
+                lambda: self._retrieve_and_rank(query.text, query.lang, limit, discount, price_range, ratings, fingerprint,
+                                         query_embedding=query_embedding)
+            )
+        else:
+            page_state = decode_cursor(cursor, limit)
+            if page_state.get("q") != fingerprint:
+                raise ValueError("Pagination cursor does not belong to this query.")
+            organic = self._retrieve_and_rank(query.text, query.lang, limit, discount, price_range, ratings, fingerprint,
+                                             page_state, query_embedding)
+
+        facets = {}
+        if facets_future is not None:
+            try:
+                with stage_timer("facets_wait"):
+                    facets = facets_future.result()
+            except Exception as e:
+                print(f"Could not fetch facets: {e}")
+
+        # Ads are picked per request, outside the cache, so rotation still varies for cached queries.
+        # Deeper pages carry organic results only.
+        dominant_category = organic["dominant_category"]
+        with stage_timer("ads_banner"):
+            relevant_ads = self.get_relevant_ads(dominant_category) if cursor is None else []
+            relevant_banner = self.get_relevant_banner(dominant_category) if cursor is None else None
+
+        with stage_timer("blend"):
+            final_page_content = self.blend_results(organic["products"], relevant_ads, relevant_banner)
+
+        view_preference = self.merch_config.get_view_preference(dominant_category)
+
+        return {
+            "page_content": final_page_content,
+            "facets": facets,
+            "view_preference": view_preference,
+            "next_cursor": organic["next_cursor"]
+        }
+
+    def _search_page(self, es_query, page_state):
+        """
+        Fetches a page past the first one inside a point-in-time so results
+        stay stable while the user pages. The first hop (and any hop whose PIT
+        has expired) opens a new PIT at the cursor offset; later hops continue
+        with `search_after`. A superseded PIT, and the PIT of the last page, is
+        closed rather than left open until its keep-alive runs out.
+        """
+        es_query["sort"] = [{"_score": "desc"}]
+        pit_id, search_after = page_state.get("pit"), page_state.get("after")
+        response = None
+        if pit_id and search_after:
+            try:
+                response = self.es_client.search(body={**es_query, "pit": {"id": pit_id, "keep_alive": PIT_KEEP_ALIVE}, "search_after": search_after})
+            except NotFoundError:
+                print("Search point-in-time expired; reopening at the cursor offset.")
+        if response is None:
+            self._close_pit(pit_id)
+            new_pit_id = self.es_client.open_point_in_time(index="products_index", keep_alive=PIT_KEEP_ALIVE)["id"]
+            response = self.es_client.search(body={**es_query, "pit": {"id": new_pit_id, "keep_alive": PIT_KEEP_ALIVE}, "from": page_state["offset"]})
+        if len(response['hits']['hits']) < es_query["size"]:
+            # No next cursor will carry this PIT.
+            self._close_pit(response.get("pit_id"))
+        return response
+
+    def _close_pit(self, pit_id):
+        if not pit_id:
+            return
         try:
-            response = self.es_client.get(index="products_index", id=asin)
-            
-            product_data = response['_source']
-            
-            product_data['asin'] = response['_id']
-            
-            return product_data
+            self.es_client.close_point_in_time(id=pit_id)
         except NotFoundError:
-            return None
+            # Already expired; nothing is left open.
+            pass
         except Exception as e:
-            print(f"An error occurred while fetching product by ASIN: {e}")
-            return None
+            print(f"Could not close search point-in-time: {e}")
 
-    def search_products(self, user_query: str, limit: int = 40, discount: int = 0, price_range=None, ratings: int = 0):
-        if not user_query:
-            return {"page_content": [], "facets": {}, "view_preference": "grid"}
+    def rerank(self, query_embedding, candidates):
+        """Orders ES candidates by cosine similarity to the query embedding."""
+        results_df = pd.DataFrame(candidates)
+        product_embeddings = np.array([p['embedding'] for p in candidates]).astype(np.float32)
+        cosine_scores = util.cos_sim(query_embedding, product_embeddings)
+        results_df['semantic_similarity'] = cosine_scores.flatten()
 
-        query_embedding = self.embedding_model.encode(user_query, normalize_embeddings=True)
-        
-        lang = self.detect_language(user_query)
+        # The embedding is only needed for the rerank; dropping it keeps cached pages small.
+        return results_df.drop(columns=['embedding']).sort_values(
+            by='semantic_similarity', ascending=False
+        ).to_dict(orient='records')
 
-        filters = []
-        if discount > 0: filters.append({"range": {"discount_percentage": {"gte": discount}}})
-        if price_range: filters.append({"range": {"final_price": {"gte": price_range[0], "lte": price_range[1]}}})
-        if ratings > 0: filters.append({"range": {"rating": {"gte": ratings}}})
+    def _retrieve_and_rank(self, user_query: str, lang: str, page_size: int, discount: int = 0, price_range=None,
+                           ratings: int = 0, fingerprint: str = None, page_state: dict = None, query_embedding=None):
+        """
+        Runs the hybrid ES query for one page and reranks it semantically. The
+        result holds only the organic, request-independent part of the page so
+        it can be cached.
+        """
+        if query_embedding is None:
+            query_embedding = self.encode_query(user_query)
+        offset = page_state["offset"] if page_state else 0
+
+        filters = build_filters(discount, price_range, ratings)
+        title_field, description_field = language_fields(lang)
+
+        # Fixed by the first page and carried in the cursor, so every hop runs the same query.
+        if page_state:
+            knn_k, num_candidates = page_state["k"], page_state["nc"]
+        else:
+            knn_k = min(max(page_size, KNN_PAGINATION_DEPTH), MAX_KNN_CANDIDATES)
+            num_candidates = min(max(int(knn_k * KNN_CANDIDATES_MULTIPLIER), knn_k), MAX_KNN_CANDIDATES)
 
-        title_field = "title_hi" if lang == 'hi' else "title"
-        description_field = "description_hi" if lang == 'hi' else "description"
-        
         es_query = {
-            "size": 100,
-            "query": {"bool": {"must": {"multi_match": {"query": user_query, "fields": [f"{title_field}^3", f"{description_field}^2", "brand", "product_specifications.value"], "fuzziness": "AUTO"}}, "filter": filters}},
-            "knn": {"field": "embedding", "query_vector": query_embedding, "k": 100, "num_candidates": 200},
-            "aggs": {"brands": {"terms": {"field": "brand", "size": 10}}, "departments": {"terms": {"field": "department", "size": 10}}}
+            "size": page_size,
+            "query": build_text_query(user_query, lang, filters),
+            "knn": build_knn(query_embedding, knn_k, num_candidates, filters)
         }
-        
-        response = self.es_client.search(index="products_index", body=es_query)
+
+        if page_state is None:
+            with stage_timer("es_search"):
+                response = self.es_client.search(index="products_index", body=es_query)
+        else:
+            with stage_timer("es_search_page"):
+                response = self._search_page(es_query, page_state)
         
         candidates = []
         for hit in response['hits']['hits']:
@@ -127,37 +376,29 @@ class SearchService:
             product_data['description'] = product_data.get(description_field, product_data.get('description'))
             candidates.append(product_data)
 
-        facets = {"brands": response['aggregations']['brands']['buckets'], "departments": response['aggregations']['departments']['buckets']}
+        hits = response['hits']['hits']
+        next_cursor = None
+        # No cursor for a page that would end past the result window, which ES would refuse.
+        if len(hits) == page_size and offset + len(hits) + page_size <= MAX_RESULT_WINDOW:
+            next_cursor = encode_cursor({
+                "q": fingerprint,
+                "offset": offset + len(hits),
+                "k": knn_k,
+                "nc": num_candidates,
+                "pit": response.get("pit_id"),
+                "after": hits[-1].get("sort")
+            })
 
         if not candidates:
-            return {"page_content": [], "facets": facets, "view_preference": "grid"}
-
-        results_df = pd.DataFrame(candidates)
-        product_embeddings = np.array([p['embedding'] for p in candidates]).astype(np.float32)
-        cosine_scores = util.cos_sim(query_embedding, product_embeddings)
-        results_df['semantic_similarity'] = cosine_scores.flatten()
+            return {"products": [], "dominant_category": None, "next_cursor": None}
 
-        semantically_ranked_products = results_df.sort_values(
-            by='semantic_similarity', ascending=False
-        ).to_dict(orient='records')
+        with stage_timer("rerank"):
+            semantically_ranked_products = self.rerank(query_embedding, candidates)
         
         dominant_category = None
         if semantically_ranked_products:
             top_departments = [p.get('department') for p in semantically_ranked_products[:10] if p.get('department')]
             if top_departments:
                 dominant_category = Counter(top_departments).most_common(1)[0][0]
-        
-        relevant_ads = self.get_relevant_ads(dominant_category)
-        relevant_banner = self.get_relevant_banner(dominant_category)
-
-        final_page_content = self.blend_results(semantically_ranked_products, relevant_ads, relevant_banner)
-
-        view_preference = self.category_view_map.get(dominant_category, 'grid')
-
-        return {
-            "page_content": final_page_content[:limit],
-            "facets": facets, 
-            "view_preference": view_preference
-        }
 
-search_service = SearchService()
\ No newline at end of file
+        return {"products": semantically_ranked_products, "dominant_category": dominant_category, "next_cursor": next_cursor}
@@ -0,0 +1,195 @@
+import argparse
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+import uvicorn
+
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "2"))
+# A worker that dies sooner than this after starting is restarted after a pause, so a crash loop does not spin.
+MIN_WORKER_UPTIME = 5.0
+RESTART_DELAY = 1.0
+
+def process_memory(pid: int) -> dict:
+    """
+    Memory of a process in MB from /proc/<pid>/smaps_rollup (Linux). `rss`
+    counts every resident page, shared or not; `pss` splits shared pages
+    evenly between the processes mapping them, so the PSS of all processes
+    adds up to what the box really spends; `private` is what the process
+    alone holds.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields.get("Rss", 0.0), "pss": fields.get("Pss", 0.0),
+        "shared": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0)
+    }
+
+def print_memory_report(processes):
+    """`processes` is a list of (label, pid)."""
+    print(f"\n{'process':<12}{'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'shared MB':>11}{'private MB':>12}")
+    total_pss = 0.0
+    for label, pid in processes:
+        try:
+            memory = process_memory(pid)
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+        total_pss += memory["pss"]
+        print(f"{label:<12}{pid:>8}{memory['rss']:>10.0f}{memory['pss']:>10.0f}{memory['shared']:>11.0f}{memory['private']:>12.0f}")
+    print(f"{'total PSS':<20}{total_pss:>20.0f}\n", flush=True)
+
+def run_worker(sock, args, ready_fd: int):
+    """Serves the app on the inherited listening socket until uvicorn is told to stop."""
+    import app as app_module
+
+    # Leftover frozen objects stay frozen; new ones in the worker are collected as usual.
+    gc.enable()
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        # One intra-op pool per worker sized to its share of the cores, instead of every worker using them all.
+        torch.set_num_threads(max((os.cpu_count() or 1) // args.workers, 1))
+
+    def report_ready():
+        while not getattr(app_module.app.state, "ready", False):
+            time.sleep(0.2)
+        os.write(ready_fd, f"{os.getpid()}\n".encode())
+
+    threading.Thread(target=report_ready, name="ready-reporter", daemon=True).start()
+    config = uvicorn.Config(app_module.app, log_level=args.log_level, timeout_graceful_shutdown=args.graceful_timeout)
+    uvicorn.Server(config).run(sockets=[sock])
+
+class Supervisor:
+    """
+    Forks the workers from a master that already holds the shared state and
+    restarts any worker that exits. SIGTERM or SIGINT stops the workers and
+    the master; SIGUSR1 prints the memory report again, e.g. under load to
+    see how many shared pages the workers have since copied.
+    """
+    def __init__(self, sock, args):
+        self.sock = sock
+        self.args = args
+        self.children = {}
+        self.ready = set()
+        self.reported = False
+        self.stopping = False
+        self.ready_r, self.ready_w = os.pipe()
+
+    def spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+                    signal.signal(signum, signal.SIG_DFL)
+                os.close(self.ready_r)
+                run_worker(self.sock, self.args, self.ready_w)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = (slot, time.monotonic())
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report(self, signum=None, frame=None):
+        workers = sorted(self.children.items(), key=lambda item: item[1][0])
+        print_memory_report([("master", os.getpid())] + [(f"worker {slot}", pid) for pid, (slot, _) in workers])
+
+    def _read_ready(self):
+        for line in os.read(self.ready_r, 4096).decode().split():
+            self.ready.add(int(line))
+        if self.args.memory_report and not self.reported and self.ready >= set(self.children):
+            self.reported = True
+            print(f"All {len(self.children)} workers ready ({'preloaded' if self.args.preload else 'no preload'}).")
+            self.report()
+
+    def _reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            slot, started = self.children.pop(pid)
+            self.ready.discard(pid)
+            if self.stopping:
+                continue
+            print(f"Worker {slot} (pid {pid}) exited with code {os.waitstatus_to_exitcode(status)}; restarting it.")
+            if time.monotonic() - started < MIN_WORKER_UPTIME:
+                time.sleep(RESTART_DELAY)
+            self.spawn(slot)
+
+    def run(self):
+        for slot in range(self.args.workers):
+            self.spawn(slot)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGUSR1, self.report)
+        while self.children:
+            readable, _, _ = select.select([self.ready_r], [], [], 0.5)
+            if readable:
+                self._read_ready()
+            self._reap()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serves the API from forked workers that share the model and indexes the master loaded once."
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        help="Let every worker load its own copies (for comparing memory).")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="Print per-process RSS/PSS once every worker is ready.")
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    # Collections in the master would only touch objects the workers are about to share.
+    gc.disable()
+    import app as app_module
+    from shared_cache import SHARED_CACHE_BACKEND, SHARED_CACHE_DIR, reset_shared_caches
+    if SHARED_CACHE_BACKEND == "shared":
+        # Entries from a previous deployment may come from a different model.
+        reset_shared_caches()
+        print(f"Workers share the suggestion and query embedding caches in {SHARED_CACHE_DIR}.")
+    if args.preload:
+        started = time.perf_counter()
+        app_module.preload_shared_state()
+        print(f"Preloaded shared state in {time.perf_counter() - started:.1f}s.")
+    # Moves everything allocated so far out of the collector's reach, so the workers'
+    # collections never write to (and so copy) the shared objects' pages.
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    print(f"Master {os.getpid()} listening on {args.host}:{args.port} with {args.workers} workers.")
+    Supervisor(sock, args).run()
+
+if __name__ == '__main__':
+    main()
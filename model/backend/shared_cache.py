@@ -0,0 +1,248 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+import orjson
+
+from result_cache import TTLCache
+
+# "memory" keeps a TTLCache per process; "shared" maps one file per cache that every worker on the box reads and writes.
+SHARED_CACHE_BACKEND = os.getenv("SHARED_CACHE_BACKEND", "memory").strip().lower()
+SHARED_CACHE_DIR = os.getenv("SHARED_CACHE_DIR", os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "flipkart-search-cache"))
+SHARED_CACHE_SLOT_SIZE = int(os.getenv("SHARED_CACHE_SLOT_SIZE", "2048"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+
+MAGIC = b"SHCACHE1"
+FILE_HEADER = struct.Struct("<8sQQ")
+FILE_HEADER_SIZE = 64
+# seq (odd while a write is in progress), key digest, expiry (epoch seconds), value length.
+SLOT_HEADER = struct.Struct("<Q16sdI4x")
+SEQ = struct.Struct("<Q")
+# Slots a key may live in; a lookup or insert probes this many consecutive slots.
+PROBE_LENGTH = 4
+MAX_READ_ATTEMPTS = 16
+LOCK_STRIPES = 64
+
+class JSONCodec:
+    """Suggestion lists and other JSON-shaped values."""
+    @staticmethod
+    def encode(value) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    @staticmethod
+    def decode(data: bytes):
+        return orjson.loads(data)
+
+class Float32Codec:
+    """Query vectors, stored as their raw float32 bytes."""
+    @staticmethod
+    def encode(value) -> bytes:
+        return np.asarray(value, dtype=np.float32).tobytes()
+
+    @staticmethod
+    def decode(data: bytes):
+        # A writable array, as torch.from_numpy (used by the rerank) expects.
+        return np.frombuffer(data, dtype=np.float32).copy()
+
+CODECS = {"json": JSONCodec, "float32": Float32Codec}
+
+def key_digest(key) -> bytes:
+    return hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).digest()
+
+class SharedMemoryCache:
+    """
+    A fixed-size hash table in a memory-mapped file, so every worker process
+    on the box shares one warm cache. It has the same `get`/`set`/
+    `get_or_compute`/`stats` surface as TTLCache.
+
+    Each slot carries a sequence number (a seqlock): a writer makes it odd,
+    writes the slot and makes it even again, and a reader retries when the
+    number was odd or changed while it copied the slot. Reads therefore take
+    no lock. Writers serialize per slot with a thread lock plus an fcntl
+    byte-range lock across processes. A full probe window evicts the entry
+    closest to expiry. Values larger than a slot are not cached. The slot
+    protocol relies on x86-64 store ordering; there are no explicit fences.
+    """
+    def __init__(self, path: str, max_size: int, ttl: float, codec: str = "json",
+                 slot_size: int = SHARED_CACHE_SLOT_SIZE, name: str = "cache"):
+        self.path = path
+        self.slots = max(max_size, PROBE_LENGTH)
+        self.slot_size = -(-slot_size // 64) * 64
+        self.capacity = self.slot_size - SLOT_HEADER.size
+        self.max_size = self.slots
+        self.ttl = ttl
+        self.codec = CODECS[codec]
+        self.name = name
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversize = 0
+        self.read_retries = 0
+        self.write_waits = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = FILE_HEADER_SIZE + self.slots * self.slot_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, FILE_HEADER_SIZE, 0)
+        try:
+            magic, slots, slot_size = FILE_HEADER.unpack(os.pread(self._fd, FILE_HEADER.size, 0).ljust(FILE_HEADER.size, b"\0"))
+            if magic != MAGIC:
+                # A new (zero-filled) file is an empty table.
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, FILE_HEADER.pack(MAGIC, self.slots, self.slot_size), 0)
+            elif (slots, slot_size) != (self.slots, self.slot_size):
+                raise ValueError(f"Shared cache '{path}' has {slots} slots of {slot_size} bytes, "
+                                 f"expected {self.slots} of {self.slot_size}; remove it or fix the settings.")
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, FILE_HEADER_SIZE, 0)
+        self._mm = mmap.mmap(self._fd, size)
+
+    def _offset(self, slot: int) -> int:
+        return FILE_HEADER_SIZE + slot * self.slot_size
+
+    def _probe(self, digest: bytes):
+        first = int.from_bytes(digest[:8], "little") % self.slots
+        return [(first + i) % self.slots for i in range(PROBE_LENGTH)]
+
+    def _read_slot(self, slot: int):
+        """A consistent (digest, expires_at, value bytes) snapshot of the slot, or None if it kept changing."""
+        offset = self._offset(slot)
+        for attempt in range(MAX_READ_ATTEMPTS):
+            seq, digest, expires_at, length = SLOT_HEADER.unpack_from(self._mm, offset)
+            if not seq & 1:
+                data = self._mm[offset + SLOT_HEADER.size: offset + SLOT_HEADER.size + min(length, self.capacity)]
+                if SEQ.unpack_from(self._mm, offset)[0] == seq:
+                    return digest, expires_at, data
+            self.read_retries += 1
+            # Lets a writer thread of this process that holds the slot finish.
+            time.sleep(0)
+        return None
+
+    def _lookup(self, digest: bytes, now: float):
+        for slot in self._probe(digest):
+            snapshot = self._read_slot(slot)
+            if snapshot is not None and snapshot[0] == digest and now < snapshot[1]:
+                return snapshot[2]
+        return None
+
+    def get(self, key):
+        data = self._lookup(key_digest(key), time.time())
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.codec.decode(data)
+
+    def set(self, key, value):
+        data = self.codec.encode(value)
+        if len(data) > self.capacity:
+            self.oversize += 1
+            return
+        digest = key_digest(key)
+        now = time.time()
+        # Same key, else a free or expired slot, else the one closest to expiry.
+        candidates = []
+        for slot in self._probe(digest):
+            _, slot_digest, expires_at, _ = SLOT_HEADER.unpack_from(self._mm, self._offset(slot))
+            rank = 0 if slot_digest == digest else 1 if expires_at <= now else 2
+            candidates.append((rank, expires_at, slot))
+        rank, _, slot = min(candidates)
+        if rank == 2:
+            self.evictions += 1
+        self._write_slot(slot, digest, now + self.ttl, data)
+
+    def _write_slot(self, slot: int, digest: bytes, expires_at: float, data: bytes):
+        offset = self._offset(slot)
+        with self._locks[slot % LOCK_STRIPES]:
+            try:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, self.slot_size, offset)
+            except OSError:
+                self.write_waits += 1
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, self.slot_size, offset)
+            try:
+                seq = SEQ.unpack_from(self._mm, offset)[0]
+                SEQ.pack_into(self._mm, offset, seq + 1)
+                self._mm[offset + SLOT_HEADER.size: offset + SLOT_HEADER.size + len(data)] = data
+                SLOT_HEADER.pack_into(self._mm, offset, seq + 1, digest, expires_at, len(data))
+                SEQ.pack_into(self._mm, offset, seq + 2)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self.slot_size, offset)
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for `key`, computing and storing it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        for slot in range(self.slots):
+            self._write_slot(slot, bytes(16), 0.0, b"")
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+    def stats(self):
+        now = time.time()
+        size = sum(1 for slot in range(self.slots)
+                   if SLOT_HEADER.unpack_from(self._mm, self._offset(slot))[2] > now)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "stale_hits": 0,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "oversize": self.oversize,
+            "read_retries": self.read_retries,
+            "write_waits": self.write_waits,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def make_cache(name: str, max_size: int, ttl: float, codec: str = "json"):
+    """
+    The cache called `name` for this process, created on first use with the
+    backend SHARED_CACHE_BACKEND selects. Services asking for the same name
+    get the same cache, and with the shared backend so do the other workers.
+    A shared file that cannot be used falls back to an in-process TTLCache.
+    """
+    with _caches_lock:
+        if name not in _caches:
+            if SHARED_CACHE_BACKEND == "shared":
+                try:
+                    _caches[name] = SharedMemoryCache(os.path.join(SHARED_CACHE_DIR, f"{name}.cache"),
+                                                      max_size, ttl, codec, name=name)
+                except (OSError, ValueError) as e:
+                    print(f"Warning: Shared cache '{name}' unavailable, using a per-process cache: {e}")
+            elif SHARED_CACHE_BACKEND != "memory":
+                raise ValueError(f"Unknown SHARED_CACHE_BACKEND '{SHARED_CACHE_BACKEND}'; expected 'memory' or 'shared'.")
+            if name not in _caches:
+                _caches[name] = TTLCache(max_size=max_size, ttl=ttl, name=name)
+        return _caches[name]
+
+def query_embedding_cache():
+    """Query vectors, shared by search and autosuggest."""
+    return make_cache("query_embeddings", QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL, codec="float32")
+
+def reset_shared_caches():
+    """Removes the shared cache files, e.g. before forking workers for a new deployment whose model may differ."""
+    if not os.path.isdir(SHARED_CACHE_DIR):
+        return
+    for filename in os.listdir(SHARED_CACHE_DIR):
+        if filename.endswith(".cache"):
+            os.remove(os.path.join(SHARED_CACHE_DIR, filename))
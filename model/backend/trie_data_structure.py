@@ -19,4 +19,23 @@ class Trie:
                 node.children[char] = TrieNode()
             node = node.children[char]
         node.is_end_of_word = True
-        node.count = count
\ No newline at end of file
+        node.count = count
+
+    def top_completions(self, prefix, limit=5):
+        """Returns up to `limit` (word, count) pairs starting with `prefix`, most frequent first."""
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        completions = []
+        stack = [(node, prefix)]
+        while stack:
+            node, word = stack.pop()
+            if node.is_end_of_word:
+                completions.append((word, node.count))
+            for char, child in node.children.items():
+                stack.append((child, word + char))
+        completions.sort(key=lambda item: (-item[1], item[0]))
+        return completions[:limit]
@@ -0,0 +1,40 @@
+import csv
+import os
+import time
+from collections import Counter
+
+QUERY_LOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'query_product_log.csv')
+WARMUP_QUERY_COUNT = int(os.getenv("WARMUP_QUERY_COUNT", "50"))
+
+def load_top_queries(path: str = QUERY_LOG_PATH, count: int = WARMUP_QUERY_COUNT):
+    """Returns the `count` most frequent queries from the query log, most frequent first."""
+    counts = Counter()
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                query = (row.get('search_query') or '').strip()
+                if query:
+                    counts[query] += 1
+    except FileNotFoundError:
+        print(f"Warning: Query log not found at {path}. Skipping warm-up.")
+        return []
+    return [query for query, _ in counts.most_common(count)]
+
+def warm_up(search_service, autosuggest_service, queries):
+    """
+    Replays head queries through both services so the embedding model, the
+    in-process caches and the Elasticsearch file-system cache are hot before
+    the instance reports ready. Failures are logged and skipped.
+    """
+    started = time.perf_counter()
+    warmed = 0
+    for query in queries:
+        try:
+            search_service.search_products(user_query=query)
+            # A short prefix and the full query cover the typical keystroke path.
+            for prefix in {query[:3], query}:
+                autosuggest_service.get_flipkart_style_suggestions(prefix=prefix)
+            warmed += 1
+        except Exception as e:
+            print(f"Warm-up query '{query}' failed: {e}")
+    print(f"Warm-up replayed {warmed}/{len(queries)} queries in {time.perf_counter() - started:.1f}s.")
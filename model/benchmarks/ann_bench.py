@@ -0,0 +1,134 @@
+import os
+
+# One BLAS thread per process: "one core" is a single process, "all cores" is a process pool.
+for _var in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from ann_index import IVFIndex, ANN_INDEX_DIR, default_nlist
+
+DEFAULT_NPROBES = (1, 2, 4, 8, 16, 32, 64)
+
+def synthetic_embeddings(count: int, dim: int, clusters: int, seed: int = 0):
+    """Unit vectors scattered around random topic centres, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, size=count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def make_queries(vectors, count: int, noise: float, seed: int = 1):
+    """Perturbed copies of random database vectors, standing in for query embeddings near real products."""
+    rng = np.random.default_rng(seed)
+    queries = np.asarray(vectors[rng.choice(len(vectors), size=count, replace=False)], dtype=np.float32)
+    queries = queries + noise * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+def exact_search(vectors, query, k: int):
+    scores = vectors @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+_worker_index = None
+
+def _init_worker(directory: str):
+    global _worker_index
+    _worker_index = IVFIndex.load(directory)
+
+def _run_queries(queries, k: int, nprobe: int):
+    """Times a batch in a worker; nprobe 0 means exact search over the stored vectors."""
+    started = time.perf_counter()
+    for query in queries:
+        if nprobe:
+            _worker_index.search(query, k, nprobe)
+        else:
+            exact_search(_worker_index.vectors, query, k)
+    return time.perf_counter() - started
+
+def parallel_qps(pool, workers: int, queries, k: int, nprobe: int) -> float:
+    chunks = np.array_split(queries, workers)
+    started = time.perf_counter()
+    list(pool.map(_run_queries, chunks, [k] * workers, [nprobe] * workers))
+    return len(queries) / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k against exact search versus QPS for the IVF index.")
+    parser.add_argument("--index", default=None, help=f"A saved index directory (e.g. {ANN_INDEX_DIR}).")
+    parser.add_argument("--synthetic", type=int, default=0, help="Build a throwaway index over this many synthetic vectors instead.")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--query-noise", type=float, default=0.5)
+    parser.add_argument("--k", type=int, default=40)
+    parser.add_argument("--nprobe", type=int, nargs="*", default=list(DEFAULT_NPROBES))
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.index or ANN_INDEX_DIR
+        if args.synthetic:
+            nlist = args.nlist or default_nlist(args.synthetic)
+            print(f"Building a synthetic index: {args.synthetic} x {args.dim}, {nlist} lists...")
+            started = time.perf_counter()
+            vectors = synthetic_embeddings(args.synthetic, args.dim, clusters=max(nlist // 4, 1))
+            IVFIndex.build(vectors, nlist=nlist).save(scratch)
+            print(f"Built in {time.perf_counter() - started:.1f}s.")
+            directory = scratch
+        elif not os.path.isdir(directory):
+            print(f"❌ No index at {directory}. Run data_management/build_ann_index.py or pass --synthetic N.")
+            sys.exit(1)
+
+        index = IVFIndex.load(directory)
+        # Ground truth and results are both expressed as positions in the stored (list-ordered) matrix.
+        positions = np.empty(len(index), dtype=np.int64)
+        positions[index.rows] = np.arange(len(index))
+        queries = make_queries(index.vectors, args.queries, args.query_noise)
+        truth = [set(exact_search(index.vectors, q, args.k).tolist()) for q in queries]
+
+        results = []
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(directory,)) as pool:
+            # Warm the page cache and the workers before timing.
+            parallel_qps(pool, args.workers, queries, args.k, 0)
+            _init_worker(directory)
+
+            for nprobe in [0] + sorted(set(args.nprobe)):
+                if nprobe:
+                    found = [set(positions[index.search(q, args.k, nprobe)[0]].tolist()) for q in queries]
+                    recall = float(np.mean([len(f & t) / args.k for f, t in zip(found, truth)]))
+                else:
+                    recall = 1.0
+                single_qps = len(queries) / _run_queries(queries, args.k, nprobe)
+                all_qps = parallel_qps(pool, args.workers, queries, args.k, nprobe)
+                results.append({"nprobe": nprobe or "exact", "recall": round(recall, 4),
+                                "qps_1_core": round(single_qps, 1), f"qps_{args.workers}_cores": round(all_qps, 1),
+                                "latency_ms_1_core": round(1000 / single_qps, 3)})
+
+    print(f"\n{len(index)} vectors, {index.nlist} lists, {len(queries)} queries, recall@{args.k}")
+    print(f"{'nprobe':>8}{'recall':>10}{'ms/query':>10}{'QPS 1 core':>14}{f'QPS {args.workers} cores':>16}")
+    for row in results:
+        print(f"{row['nprobe']:>8}{row['recall']:>10.3f}{row['latency_ms_1_core']:>10.3f}"
+              f"{row['qps_1_core']:>14.1f}{row[f'qps_{args.workers}_cores']:>16.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "config": {"count": len(index), "dim": int(index.vectors.shape[1]), "nlist": index.nlist,
+                           "queries": len(queries), "k": args.k, "workers": args.workers, "synthetic": bool(args.synthetic)},
+                "results": results
+            }, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
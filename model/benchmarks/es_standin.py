@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+import regex as re
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from local_engine import LocalSearchEngine
+from catalog import QUERY_LOG_PATH
+
+PRODUCTS_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'cleaned-amazon-products.csv')
+EMBEDDING_DIM = 384
+TOKEN_PATTERN = re.compile(r'\w+')
+
+def tokenize(text) -> list:
+    return TOKEN_PATTERN.findall(str(text).lower()) if text else []
+
+class HashingEncoder:
+    """
+    A stand-in for the SentenceTransformer: hashes words and character
+    trigrams into a fixed-size unit vector. Similar strings land close
+    together, which is enough to exercise the kNN and rerank paths offline.
+    `latency` (seconds) emulates the real model's encode time.
+    """
+    def __init__(self, dim: int = EMBEDDING_DIM, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency
+
+    def encode(self, text, normalize_embeddings: bool = True, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            padded = f" {token} "
+            for feature in [token] + [padded[i:i + 3] for i in range(len(padded) - 2)]:
+                h = zlib.crc32(feature.encode('utf-8'))
+                vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        if normalize_embeddings and norm:
+            vector /= norm
+        return vector
+
+class StandInElasticsearch(LocalSearchEngine):
+    """
+    The local engine over the small, checked-in `cleaned-amazon-products.csv`
+    with hashed title embeddings, so benchmarks run without the LFS catalog,
+    the embedding model or Elasticsearch. `latency` (seconds) is added to
+    every call to stand in for the network round trip.
+    """
+    def __init__(self, products_path: str = PRODUCTS_PATH, query_log_path: str = QUERY_LOG_PATH,
+                 encoder=None, latency: float = 0.0):
+        self.latency = latency
+        encoder = encoder or HashingEncoder()
+
+        df = pd.read_csv(products_path).drop_duplicates(subset='asin')
+        df = df.fillna({column: '' if df[column].dtype == object else 0 for column in df.columns})
+        docs = df.drop(columns=['asin']).to_dict(orient='records')
+        for doc in docs:
+            # The real index carries Hindi translations; English copies keep the response shape.
+            doc.setdefault('title_hi', doc.get('title', ''))
+            doc.setdefault('description_hi', doc.get('description', ''))
+        embeddings = np.array([encoder.encode(doc.get('title', '')) for doc in docs], dtype=np.float32)
+
+        try:
+            query_counts = pd.read_csv(query_log_path)['search_query'].dropna().astype(str).value_counts().to_dict()
+        except FileNotFoundError:
+            query_counts = {}
+        super().__init__(df['asin'].astype(str).tolist(), docs, embeddings, query_counts)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def open_point_in_time(self, *args, **kwargs):
+        self._wait()
+        return super().open_point_in_time(*args, **kwargs)
+
+    def mget(self, *args, **kwargs):
+        self._wait()
+        return super().mget(*args, **kwargs)
+
+    def search(self, *args, **kwargs):
+        self._wait()
+        return super().search(*args, **kwargs)
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from metrics import stage_timer, ServerTimingMiddleware, _request_spans
+
+ITERATIONS = 200_000
+# Spans a full (uncached) /search records: parse_query, embed, es_search, rerank,
+# es_facets, facets_wait, ads_banner, blend.
+SPANS_PER_REQUEST = 8
+OVERHEAD_BUDGET = 0.01
+
+def per_span_cost(iterations: int) -> float:
+    """Seconds added by one stage_timer block inside a request, net of the bare loop."""
+    token = _request_spans.set([])
+    try:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            pass
+        baseline = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for i in range(iterations):
+            if i % 1000 == 0:
+                _request_spans.get().clear()
+            with stage_timer("overhead_probe"):
+                pass
+        timed = time.perf_counter() - started
+    finally:
+        _request_spans.reset(token)
+    return max(timed - baseline, 0.0) / iterations
+
+async def _minimal_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+async def _drive(app, iterations: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/search", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - started
+
+def per_request_middleware_cost(iterations: int) -> float:
+    """Seconds the Server-Timing middleware adds to one request, net of the bare ASGI call."""
+    bare = asyncio.run(_drive(_minimal_app, iterations))
+    wrapped = asyncio.run(_drive(ServerTimingMiddleware(_minimal_app), iterations))
+    return max(wrapped - bare, 0.0) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the cost of the latency instrumentation.")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS)
+    parser.add_argument("--spans-per-request", type=int, default=SPANS_PER_REQUEST)
+    parser.add_argument("--request-ms", type=float, default=20.0,
+                        help="Reference request latency to express the overhead against (e.g. the /search p50).")
+    args = parser.parse_args()
+
+    span_cost = per_span_cost(args.iterations)
+    middleware_cost = per_request_middleware_cost(args.iterations // 10)
+    request_cost = span_cost * args.spans_per_request + middleware_cost
+    overhead = request_cost / (args.request_ms / 1000)
+
+    print(f"Per span:        {span_cost * 1e6:.2f} µs")
+    print(f"Per request MW:  {middleware_cost * 1e6:.2f} µs")
+    print(f"Per request:     {request_cost * 1e6:.2f} µs for {args.spans_per_request} spans")
+    print(f"Overhead:        {overhead:.3%} of a {args.request_ms:.1f} ms request (budget {OVERHEAD_BUDGET:.0%})")
+    if overhead > OVERHEAD_BUDGET:
+        print("❌ Instrumentation overhead exceeds the budget.")
+        sys.exit(1)
+    print("✅ Instrumentation overhead is within budget.")
+
+if __name__ == '__main__':
+    main()
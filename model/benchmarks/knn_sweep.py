@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from es_client import get_es_client
+from warmup import load_top_queries
+
+INDEX_NAME = "products_index"
+DEFAULT_CANDIDATES = (40, 60, 80, 100, 150, 200, 400, 800)
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+def exact_top_k(es, query_vector, k: int):
+    """Brute-force cosine ranking over every document: the ground truth the HNSW results are scored against."""
+    response = es.search(index=INDEX_NAME, body={
+        "size": k,
+        "_source": False,
+        "query": {
+            "script_score": {
+                "query": {"match_all": {}},
+                "script": {"source": "cosineSimilarity(params.query_vector, 'embedding') + 1.0",
+                           "params": {"query_vector": query_vector}}
+            }
+        }
+    })
+    return [hit['_id'] for hit in response['hits']['hits']]
+
+def approximate_top_k(es, query_vector, k: int, num_candidates: int):
+    started = time.perf_counter()
+    response = es.search(index=INDEX_NAME, body={
+        "size": k,
+        "_source": False,
+        "knn": {"field": "embedding", "query_vector": query_vector, "k": k, "num_candidates": num_candidates}
+    })
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return [hit['_id'] for hit in response['hits']['hits']], elapsed_ms, response.get('took', 0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k against exact cosine scoring versus latency for kNN num_candidates.")
+    parser.add_argument("--queries", type=int, default=200, help="How many of the most frequent logged queries to run.")
+    parser.add_argument("--k", type=int, default=40, help="Neighbours per query (the first results page asks for offset + page_size).")
+    parser.add_argument("--candidates", type=int, nargs="*", default=list(DEFAULT_CANDIDATES))
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    from search_service import EMBEDDING_MODEL_NAME
+
+    es = get_es_client()
+    queries = load_top_queries(count=args.queries)
+    if not queries:
+        print("❌ No queries found in the query log.")
+        sys.exit(1)
+
+    print(f"Encoding {len(queries)} queries with {EMBEDDING_MODEL_NAME}...")
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    vectors = [v.tolist() for v in model.encode(queries, batch_size=64)]
+
+    print("Computing exact top-k with script_score...")
+    truth = [set(exact_top_k(es, v, args.k)) for v in vectors]
+
+    results = []
+    for num_candidates in sorted(c for c in set(args.candidates) if c >= args.k):
+        # One unmeasured pass warms the HNSW graph pages for this setting.
+        for v in vectors[:10]:
+            approximate_top_k(es, v, args.k, num_candidates)
+        recalls, client_ms, took_ms = [], [], []
+        for v, expected in zip(vectors, truth):
+            found, elapsed, took = approximate_top_k(es, v, args.k, num_candidates)
+            recalls.append(len(expected & set(found)) / max(len(expected), 1))
+            client_ms.append(elapsed)
+            took_ms.append(took)
+        results.append({
+            "num_candidates": num_candidates,
+            "multiplier": round(num_candidates / args.k, 2),
+            "recall": round(statistics.mean(recalls), 4),
+            "min_recall": round(min(recalls), 4),
+            "client_p50_ms": round(percentile(client_ms, 50), 2),
+            "client_p95_ms": round(percentile(client_ms, 95), 2),
+            "took_p50_ms": percentile(took_ms, 50),
+            "took_p95_ms": percentile(took_ms, 95)
+        })
+
+    print(f"\n{len(queries)} queries, recall@{args.k} against exact cosine scoring")
+    print(f"{'candidates':>11}{'x k':>7}{'recall':>9}{'min':>8}{'p50 ms':>9}{'p95 ms':>9}{'took p50':>10}{'took p95':>10}")
+    for row in results:
+        print(f"{row['num_candidates']:>11}{row['multiplier']:>7.2f}{row['recall']:>9.3f}{row['min_recall']:>8.3f}"
+              f"{row['client_p50_ms']:>9.2f}{row['client_p95_ms']:>9.2f}{row['took_p50_ms']:>10}{row['took_p95_ms']:>10}")
+
+    recommended = next((row for row in results if row["recall"] >= args.target_recall), None)
+    if recommended:
+        print(f"\n✅ Smallest setting with recall >= {args.target_recall}: num_candidates={recommended['num_candidates']} "
+              f"(KNN_CANDIDATES_MULTIPLIER={recommended['multiplier']})")
+    else:
+        print(f"\n⚠️ No setting reached recall {args.target_recall}; try larger --candidates or a higher ES_HNSW_EF_CONSTRUCTION.")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "config": {"queries": len(queries), "k": args.k, "target_recall": args.target_recall},
+                "recommended": recommended,
+                "results": results
+            }, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from warmup import QUERY_LOG_PATH
+
+ENDPOINTS = ("autosuggest", "search")
+
+def load_sessions(path: str = QUERY_LOG_PATH, limit: int = None, min_prefix: int = 1):
+    """
+    Turns each row of the query log into a typing session: one /autosuggest
+    call per keystroke prefix (blank prefixes are skipped, as the search bar
+    does) followed by a /search for the full query. Log order is preserved.
+    """
+    sessions = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            query = (row.get('search_query') or '').strip()
+            if not query:
+                continue
+            prefixes = [query[:i] for i in range(min_prefix, len(query) + 1) if query[:i].strip()]
+            sessions.append((query, prefixes))
+            if limit and len(sessions) >= limit:
+                break
+    return sessions
+
+def percentile(sorted_values, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(p / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    async def timed_get(self, client, endpoint: str, params: dict):
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"/{endpoint}", params=params)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - started
+        self.statuses[endpoint][status] += 1
+        if status == "200":
+            self.latencies[endpoint].append(elapsed)
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            latencies = sorted(self.latencies[endpoint])
+            total = sum(self.statuses[endpoint].values())
+            endpoints[endpoint] = {
+                "requests": total,
+                "errors": total - len(latencies),
+                "statuses": dict(self.statuses[endpoint]),
+                "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+                "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0
+            }
+        return endpoints
+
+async def run_session(client, recorder: Recorder, session, keystroke_delay: float, page_size: int):
+    query, prefixes = session
+    for prefix in prefixes:
+        await recorder.timed_get(client, "autosuggest", {"q": prefix})
+        if keystroke_delay:
+            await asyncio.sleep(keystroke_delay)
+    await recorder.timed_get(client, "search", {"q": query, "page_size": page_size})
+
+async def run_load(client, sessions, concurrency: int, rate: float, keystroke_delay: float, page_size: int, seed: int):
+    """
+    Closed loop by default: `concurrency` virtual users each type one session
+    after another. With `rate`, sessions instead arrive as a Poisson process
+    at `rate` per second (open loop), still capped at `concurrency` in flight.
+    """
+    recorder = Recorder()
+    limit = asyncio.Semaphore(concurrency)
+    rng = random.Random(seed)
+
+    async def one(session):
+        async with limit:
+            await run_session(client, recorder, session, keystroke_delay, page_size)
+
+    started = time.perf_counter()
+    if rate:
+        tasks = []
+        for session in sessions:
+            tasks.append(asyncio.create_task(one(session)))
+            await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.gather(*tasks)
+    else:
+        await asyncio.gather(*(one(session) for session in sessions))
+    return recorder, time.perf_counter() - started
+
+def build_in_process_app(es_latency: float, encode_latency: float):
+    """
+    Wires the real FastAPI app to the in-process ES stand-in and a hashing
+    encoder, so the full request path runs without Elasticsearch or model
+    downloads. The lifespan does not run under ASGITransport, so the services
+    are built here and the app is marked ready directly.
+    """
+    from app import app
+    from autosuggest_service import AutosuggestService
+    from search_service import SearchService
+    from es_standin import StandInElasticsearch, HashingEncoder
+
+    encoder = HashingEncoder(latency=encode_latency)
+    es = StandInElasticsearch(encoder=HashingEncoder(), latency=es_latency)
+    app.state.search_service = SearchService(es_client=es, embedding_model=encoder)
+    app.state.autosuggest_service = AutosuggestService(es_client=es, embedding_model=encoder)
+    app.state.ready = True
+    app.state.startup_stage = "ready"
+    return app
+
+def print_report(result: dict, baseline: dict = None):
+    config = result["config"]
+    mode = f"{config['rate']}/s arrivals" if config["rate"] else f"{config['concurrency']} concurrent users"
+    print(f"\n{config['sessions']} sessions, {mode}, target {config['target']}, {result['duration_s']:.1f}s")
+    print(f"{'endpoint':<12}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, stats in result["endpoints"].items():
+        print(f"{endpoint:<12}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput_rps']:>10.1f}"
+              f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+        if baseline and endpoint in baseline.get("endpoints", {}):
+            before = baseline["endpoints"][endpoint]
+            deltas = []
+            for field in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+                if before[field]:
+                    deltas.append(f"{field} {(stats[field] - before[field]) / before[field]:+.1%}")
+            print(f"{'':<12}vs baseline: {', '.join(deltas)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays the query log as typing sessions against /autosuggest and /search.")
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app with the ES stand-in.")
+    parser.add_argument("--query-log", default=QUERY_LOG_PATH)
+    parser.add_argument("--sessions", type=int, default=200, help="Number of query-log rows to replay (0 for all).")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=0.0, help="Session arrivals per second (open loop). 0 runs closed loop.")
+    parser.add_argument("--keystroke-ms", type=float, default=0.0, help="Pause between keystrokes within a session.")
+    parser.add_argument("--min-prefix", type=int, default=1)
+    parser.add_argument("--page-size", type=int, default=40)
+    parser.add_argument("--es-latency-ms", type=float, default=2.0, help="Per-call latency added by the ES stand-in.")
+    parser.add_argument("--encode-ms", type=float, default=0.0, help="Per-call latency added by the stand-in encoder.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    parser.add_argument("--compare", help="A previous JSON result to print deltas against.")
+    args = parser.parse_args()
+
+    sessions = load_sessions(args.query_log, limit=args.sessions or None, min_prefix=args.min_prefix)
+    if not sessions:
+        print("❌ No sessions to replay.")
+        sys.exit(1)
+
+    if args.base_url:
+        transport, base_url, target = None, args.base_url, args.base_url
+    else:
+        app = build_in_process_app(args.es_latency_ms / 1000, args.encode_ms / 1000)
+        transport, base_url, target = httpx.ASGITransport(app=app), "http://loadtest", "in-process"
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=30.0) as client:
+            return await run_load(client, sessions, args.concurrency, args.rate,
+                                  args.keystroke_ms / 1000, args.page_size, args.seed)
+
+    recorder, elapsed = asyncio.run(run())
+    result = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "target": target, "sessions": len(sessions), "concurrency": args.concurrency, "rate": args.rate,
+            "keystroke_ms": args.keystroke_ms, "min_prefix": args.min_prefix, "page_size": args.page_size,
+            "es_latency_ms": None if args.base_url else args.es_latency_ms,
+            "encode_ms": None if args.base_url else args.encode_ms
+        },
+        "duration_s": round(elapsed, 3),
+        "endpoints": recorder.summary(elapsed)
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
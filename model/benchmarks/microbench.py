@@ -0,0 +1,229 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from es_standin import StandInElasticsearch, HashingEncoder, QUERY_LOG_PATH
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'microbench_baseline.json')
+REPEATS = 7
+MIN_REPEAT_SECONDS = 0.2
+REGRESSION_THRESHOLD = 0.25
+
+BENCHMARKS = {}
+
+def benchmark(name: str):
+    """Registers a setup function that returns the zero-argument callable to time."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+class Fixtures:
+    """Services wired to the ES stand-in and realistic inputs, built once and shared by every benchmark."""
+    _instance = None
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        from search_service import SearchService
+        from autosuggest_service import AutosuggestService
+
+        encoder = HashingEncoder()
+        self.es = StandInElasticsearch(encoder=encoder)
+        self.search_service = SearchService(es_client=self.es, embedding_model=encoder)
+        self.autosuggest_service = AutosuggestService(es_client=self.es, embedding_model=encoder)
+
+        with open(QUERY_LOG_PATH, newline='', encoding='utf-8') as f:
+            self.queries = [row['search_query'] for row in csv.DictReader(f) if row.get('search_query')]
+
+        self.query_embedding = encoder.encode("wireless bluetooth headphones")
+        response = self.es.search(index="products_index", body={
+            "size": 40, "knn": {"field": "embedding", "query_vector": self.query_embedding, "k": 40, "num_candidates": 80}
+        })
+        self.candidates = [dict(hit['_source'], asin=hit['_id']) for hit in response['hits']['hits']]
+        self.departments = [c.get('department') for c in self.candidates if c.get('department')]
+
+@benchmark("trie.insert")
+def bench_trie_insert():
+    from trie_data_structure import Trie
+    queries = Fixtures.get().queries
+
+    def run():
+        trie = Trie()
+        for query in queries:
+            trie.insert(query)
+    return run
+
+@benchmark("trie.top_completions")
+def bench_trie_lookup():
+    from trie_data_structure import Trie
+    queries = Fixtures.get().queries
+    trie = Trie()
+    for query in queries:
+        trie.insert(query)
+    prefixes = [q[:n] for q in queries[:50] for n in (1, 3, 6)]
+
+    def run():
+        for prefix in prefixes:
+            trie.top_completions(prefix)
+    return run
+
+@benchmark("detect_language")
+def bench_detect_language():
+    from query_understanding import detect_language
+    texts = Fixtures.get().queries[:100] + ["लाल जूते", "पुरुषों की घड़ी"]
+
+    def run():
+        for text in texts:
+            detect_language(text)
+    return run
+
+@benchmark("parse_query")
+def bench_parse_query():
+    from query_understanding import parse_query
+    texts = Fixtures.get().queries[:100] + ["लाल जूते", "पुरुषों की घड़ी"]
+    # The uncached path: normalization plus language detection.
+    parse = parse_query.__wrapped__
+
+    def run():
+        for text in texts:
+            parse(text)
+    return run
+
+@benchmark("search.blend_results")
+def bench_blend_results():
+    fixtures = Fixtures.get()
+    ads = [{"ad_name": "ad-1"}, {"ad_name": "ad-2"}]
+    banner = {"banner_id": "B01"}
+    return lambda: fixtures.search_service.blend_results(fixtures.candidates, ads, banner)
+
+@benchmark("search.get_relevant_ads")
+def bench_relevant_ads():
+    fixtures = Fixtures.get()
+    return lambda: fixtures.search_service.get_relevant_ads("Clothing")
+
+@benchmark("search.get_relevant_banner")
+def bench_relevant_banner():
+    fixtures = Fixtures.get()
+    departments = fixtures.departments or ["Clothing"]
+
+    def run():
+        for department in departments:
+            fixtures.search_service.get_relevant_banner(department)
+    return run
+
+@benchmark("search.rerank")
+def bench_rerank():
+    fixtures = Fixtures.get()
+    return lambda: fixtures.search_service.rerank(fixtures.query_embedding, fixtures.candidates)
+
+@benchmark("autosuggest.blend_suggestions")
+def bench_blend_suggestions():
+    service = Fixtures.get().autosuggest_service
+    queries = [{"suggestion": f"shoes {i}", "type": "query"} for i in range(4)]
+    categories = [{"suggestion": "in Footwear", "type": "category"}, {"suggestion": "in Clothing", "type": "category"}]
+    products = [{"suggestion": "Shoes 1", "type": "product"}, {"suggestion": "Running Shoe", "type": "product"},
+                {"suggestion": "Sneaker", "type": "product"}]
+    brands = [{"suggestion": "Puma", "type": "brand"}]
+    return lambda: service.blend_suggestions(queries, categories, products, brands)
+
+def measure(func, repeats: int = REPEATS):
+    """Per-call seconds over `repeats` runs, each long enough (MIN_REPEAT_SECONDS) to swamp timer noise."""
+    timer = timeit.Timer(func)
+    loops, elapsed = timer.autorange()
+    if elapsed < MIN_REPEAT_SECONDS:
+        loops = max(int(loops * MIN_REPEAT_SECONDS / max(elapsed, 1e-9)), 1)
+    timings = [t / loops for t in timer.repeat(repeat=repeats, number=loops)]
+    return {"min_us": min(timings) * 1e6, "median_us": statistics.median(timings) * 1e6, "loops": loops}
+
+def run_suite(names=None, repeats: int = REPEATS):
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if names and not any(n in name for n in names):
+            continue
+        results[name] = {k: round(v, 3) if isinstance(v, float) else v for k, v in measure(setup(), repeats).items()}
+        print(f"{name:<32}{results[name]['min_us']:>12.2f} µs  (median {results[name]['median_us']:.2f})")
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": results
+    }
+
+def compare(current: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD):
+    """Compares the min per-call times and returns the names that slowed down by more than `threshold`."""
+    regressions = []
+    print(f"\n{'benchmark':<32}{'baseline µs':>14}{'current µs':>14}{'change':>10}")
+    for name, result in current["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if before is None:
+            print(f"{name:<32}{'-':>14}{result['min_us']:>14.2f}{'new':>10}")
+            continue
+        change = (result["min_us"] - before["min_us"]) / before["min_us"]
+        flag = "  ❌" if change > threshold else ""
+        print(f"{name:<32}{before['min_us']:>14.2f}{result['min_us']:>14.2f}{change:>+10.1%}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the per-request backend hot paths.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the suite and optionally save the results.")
+    run_parser.add_argument("--filter", nargs="*", help="Only run benchmarks whose name contains one of these.")
+    run_parser.add_argument("--repeats", type=int, default=REPEATS)
+    run_parser.add_argument("--save", help="Write results to this path (use the baseline path to re-baseline).")
+
+    compare_parser = subparsers.add_parser("compare", help="Run the suite, or load a result file, and compare with a baseline.")
+    compare_parser.add_argument("results", nargs="?", help="A saved result file. Runs the suite when omitted.")
+    compare_parser.add_argument("--baseline", default=BASELINE_PATH)
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                                help="Relative slowdown that counts as a regression (0.25 = 25%%).")
+    compare_parser.add_argument("--filter", nargs="*")
+    compare_parser.add_argument("--repeats", type=int, default=REPEATS)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        current = run_suite(args.filter, args.repeats)
+        if args.save:
+            with open(args.save, 'w', encoding='utf-8') as f:
+                json.dump(current, f, indent=2)
+            print(f"✅ Results written to {args.save}")
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if args.results:
+        with open(args.results, 'r', encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        current = run_suite(args.filter, args.repeats)
+
+    regressions = compare(current, baseline, args.threshold)
+    if regressions and not args.results:
+        # A single noisy repeat set is the usual cause of a false alarm; keep the better of two runs.
+        print(f"\nRe-running {len(regressions)} flagged benchmark(s) to confirm...")
+        for name, result in run_suite(regressions, args.repeats)["benchmarks"].items():
+            if result["min_us"] < current["benchmarks"][name]["min_us"]:
+                current["benchmarks"][name] = result
+        regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print(f"❌ {len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"✅ No regressions beyond {args.threshold:.0%}.")
+
+if __name__ == '__main__':
+    main()
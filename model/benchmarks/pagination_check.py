@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from es_standin import StandInElasticsearch, HashingEncoder
+
+DEFAULT_QUERIES = ("shoes", "women dress", "watch", "leather bag", "phone cover")
+
+def page_through(service, query: str, page_size: int, pages: int):
+    """ASINs of the first `pages` pages, following the cursor."""
+    asins, cursor = [], None
+    for _ in range(pages):
+        page = service.search_products(query, limit=page_size, cursor=cursor, include_facets=False)
+        asins.extend(item["data"]["asin"] for item in page["page_content"] if item["type"] == "product")
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    return asins
+
+def check_query(service, query: str, page_size: int, pages: int):
+    """Problems found for one query: pages 1..N must hold exactly the hits of one search of N * page_size."""
+    paged = page_through(service, query, page_size, pages)
+    single = service.search_products(query, limit=page_size * pages, include_facets=False)
+    expected = [item["data"]["asin"] for item in single["page_content"] if item["type"] == "product"]
+    problems = []
+    duplicates = len(paged) - len(set(paged))
+    if duplicates:
+        problems.append(f"{duplicates} duplicate ASINs across pages")
+    # Each page is reranked on its own, so only the sets have to match.
+    missing, extra = set(expected) - set(paged), set(paged) - set(expected)
+    if missing or extra:
+        problems.append(f"{len(missing)} hits missing and {len(extra)} unexpected versus a single search")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Checks that cursor pages line up with a single search of the same depth (in-process stand-in)."
+    )
+    parser.add_argument("--queries", nargs="*", default=list(DEFAULT_QUERIES))
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=10)
+    args = parser.parse_args()
+
+    from search_service import SearchService
+
+    encoder = HashingEncoder()
+    service = SearchService(es_client=StandInElasticsearch(encoder=encoder), embedding_model=encoder)
+    failed = False
+    for query in args.queries:
+        problems = check_query(service, query, args.page_size, args.pages)
+        failed = failed or bool(problems)
+        print(f"{'❌' if problems else '✅'} {query!r}: {'; '.join(problems) or 'pages match a single search'}")
+    service.close()
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,20 @@
+import os
+
 import pandas as pd
 
+INJECTED_PRODUCTS_PATH = 'injected-products.csv'
+
 d1 = pd.read_csv('cleaned-flipkart-products.csv')
 d2 = pd.read_csv('flipkart-cleaned-dataset-hi.csv')
 
+# Products added with inject_data.py, exported from the product store; they replace catalog rows with the same asin.
+if os.path.exists(INJECTED_PRODUCTS_PATH):
+    injected = pd.read_csv(INJECTED_PRODUCTS_PATH)
+    if not injected.empty:
+        d1 = pd.concat([d1[~d1['asin'].isin(injected['asin'])], injected[d1.columns.intersection(injected.columns)]],
+                       ignore_index=True)
+        print(f"Added {len(injected)} products from the product store.")
+
 d2_subset = d2[['asin', 'title_hi', 'description_hi']]
 
 merged_df = pd.merge(d1, d2_subset, on='asin', how='left')  # 'left' keeps all rows from d1
@@ -0,0 +1,53 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.ann_index import IVFIndex, ANN_INDEX_DIR, KMEANS_ITERATIONS, default_nlist
+from backend.catalog import EMBEDDINGS_PATH
+
+def build_ann_index():
+    """
+    Builds the IVF index over the product embeddings written by
+    generate_embeddings.py and saves it for the local search engine to
+    memory-map at serve time.
+    """
+    parser = argparse.ArgumentParser(description="Builds the IVF ANN index over the product embeddings.")
+    parser.add_argument("--embeddings", default=EMBEDDINGS_PATH)
+    parser.add_argument("--output", default=ANN_INDEX_DIR)
+    parser.add_argument("--nlist", type=int, default=None, help="Number of inverted lists (default: 4 * sqrt(N)).")
+    parser.add_argument("--iterations", type=int, default=KMEANS_ITERATIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("--- Starting ANN Index Generation ---")
+    try:
+        embeddings_df = pd.read_csv(args.embeddings)
+    except FileNotFoundError:
+        print(f"Error: Embeddings not found at {args.embeddings}")
+        print("Please run 'generate_embeddings.py' first.")
+        return
+
+    embeddings_df = embeddings_df.drop_duplicates(subset='asin')
+    embeddings = np.array([json.loads(e) for e in embeddings_df['embedding']], dtype=np.float32)
+    nlist = args.nlist or default_nlist(len(embeddings))
+    print(f"Clustering {len(embeddings)} vectors of dimension {embeddings.shape[1]} into {nlist} lists...")
+
+    started = time.perf_counter()
+    index = IVFIndex.build(embeddings, nlist=nlist, labels=embeddings_df['asin'].astype(str).tolist(),
+                           iterations=args.iterations, seed=args.seed)
+    sizes = np.diff(index.offsets)
+    print(f"Built in {time.perf_counter() - started:.1f}s; list sizes min {sizes.min()}, "
+          f"median {int(np.median(sizes))}, max {sizes.max()}.")
+
+    index.save(args.output)
+    print(f"✅ Success! ANN index saved to {args.output}")
+
+if __name__ == '__main__':
+    build_ann_index()
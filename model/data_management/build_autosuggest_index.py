@@ -1,4 +1,3 @@
-import pandas as pd
 import os
 import pickle
 import sys
@@ -7,6 +6,7 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from backend.trie_data_structure import Trie
+from backend.query_popularity import refresh_query_popularity
 
 
 def build_and_save_trie():
@@ -19,14 +19,14 @@ def build_and_save_trie():
     output_path = '../central_data/autosuggest_trie.pkl'
 
     try:
-        log_df = pd.read_csv(query_log_path)
+        popularity = refresh_query_popularity(query_log_path)
     except FileNotFoundError:
         print(f"Error: Query log not found at {query_log_path}")
         print("Please run 'generate_query_log.py' first.")
         return
 
-    print("Calculating frequencies of each search query...")
-    query_counts = log_df['search_query'].value_counts()
+    print("Calculating time-decayed popularity of each search query...")
+    query_counts = popularity.integer_weights()
     
     print("Building the Trie with query data...")
     trie = Trie()
@@ -1,51 +1,48 @@
 import pandas as pd
 import os
-from collections import defaultdict
 import random
 import ast
 
 DB_PATH = '../central_data/flipkart-products-with-hindi.csv'
 OUTPUT_DIR = '../central_data/'
+HOT_SELLING_TOP_N = 5
 
 def create_categories_dataset(df):
     """
     Creates a dataset mapping each unique category to a list of product ASINs.
+    The list column is stored natively in Parquet rather than as a string.
     """
     print("Creating Categories Dataset...")
-    category_map = defaultdict(list)
-    
-    for _, row in df.iterrows():
-        asin = row['asin']
-        categories = row['categories']
-        if isinstance(categories, list):
-            for category in categories:
-                category_map[category.strip()].append(asin)
-                
-    categories_df = pd.DataFrame(list(category_map.items()), columns=['category_name', 'asin_list'])
-    
-    output_path = os.path.join(OUTPUT_DIR, 'categories_dataset.csv')
-    categories_df.to_csv(output_path, index=False)
+    has_categories = df['categories'].map(lambda value: isinstance(value, list))
+    exploded = df.loc[has_categories, ['asin', 'categories']].explode('categories').dropna(subset=['categories'])
+    exploded['category_name'] = exploded['categories'].astype(str).str.strip()
+
+    # sort=False keeps categories in order of first appearance.
+    categories_df = exploded.groupby('category_name', sort=False)['asin'].agg(list).reset_index(name='asin_list')
+
+    output_path = os.path.join(OUTPUT_DIR, 'categories_dataset.parquet')
+    categories_df.to_parquet(output_path, index=False)
     print(f"Categories Dataset saved to {output_path}")
 
 
 def create_hot_selling_dataset(df):
     """
     Creates a dataset of the top 5 best-selling products for each department
-    based on the 'bought_past_month' metric.
+    based on the 'bought_past_month' metric. Each department only needs a
+    partial sort (nlargest) rather than sorting the whole catalog.
     """
     print("\nCreating Hot-Selling/Trending Products Dataset...")
     
     df['bought_past_month'] = pd.to_numeric(df['bought_past_month'], errors='coerce').fillna(0)
-    
-    hot_selling = (df.sort_values('bought_past_month', ascending=False)
-                     .groupby('department')
-                     .head(5))
-                     
-    hot_selling_summary = hot_selling.groupby('department')['asin'].apply(list).reset_index()
-    hot_selling_summary.rename(columns={'asin': 'top_5_asins'}, inplace=True)
 
-    output_path = os.path.join(OUTPUT_DIR, 'hot_selling_dataset.csv')
-    hot_selling_summary.to_csv(output_path, index=False)
+    top_rows = (df.groupby('department')['bought_past_month']
+                  .nlargest(HOT_SELLING_TOP_N)
+                  .index.get_level_values(-1))
+
+    hot_selling_summary = df.loc[top_rows].groupby('department')['asin'].agg(list).reset_index(name='top_5_asins')
+
+    output_path = os.path.join(OUTPUT_DIR, 'hot_selling_dataset.parquet')
+    hot_selling_summary.to_parquet(output_path, index=False)
     print(f"Hot-Selling Dataset saved to {output_path}")
 
 
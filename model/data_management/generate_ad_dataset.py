@@ -1,10 +1,9 @@
 import pandas as pd
 import os
 import random
-import ast 
 
 CLEANED_PRODUCTS_PATH = '../central_data/flipkart-products-with-hindi.csv'
-CATEGORIES_SOURCE_PATH = '../central_data/hot_selling_dataset.csv'
+CATEGORIES_SOURCE_PATH = '../central_data/hot_selling_dataset.parquet'
 OUTPUT_DIR = '../central_data/'
 AD_OUTPUT_PATH = os.path.join(OUTPUT_DIR, 'advertisement_dataset.csv')
 
@@ -16,7 +15,7 @@ def generate_ad_dataset():
     print("--- Starting Ad Dataset Generation (with Images) ---")
 
     try:
-        hot_selling_df = pd.read_csv(CATEGORIES_SOURCE_PATH)
+        hot_selling_df = pd.read_parquet(CATEGORIES_SOURCE_PATH)
         products_df = pd.read_csv(CLEANED_PRODUCTS_PATH)
     except FileNotFoundError as e:
         print(f"Error: A required data file was not found. {e}")
@@ -40,19 +39,11 @@ def generate_ad_dataset():
     
     ads_data = []
 
-    for _, row in hot_selling_df.iterrows():
-        category = row['department']
-        
-        try:
-            top_asins = ast.literal_eval(row['top_5_asins'])
-        except (ValueError, SyntaxError):
-            top_asins = []
-            
-        image_url = ''
-        if top_asins:
-            top_product_asin = top_asins[0]
-            image_url = product_image_lookup.get(top_product_asin, '')
+    # top_5_asins is a native list column; its first entry is the department's best seller.
+    top_asins = hot_selling_df['top_5_asins'].str[0]
+    image_urls = top_asins.map(product_image_lookup).fillna('')
 
+    for category, image_url in zip(hot_selling_df['department'], image_urls):
         ad = {
             'ad_name': random.choice(ad_name_templates).format(category),
             'category': category,
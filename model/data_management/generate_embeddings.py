@@ -1,11 +1,21 @@
 import pandas as pd
 from sentence_transformers import SentenceTransformer
 import numpy as np
+import argparse
+import glob
+import hashlib
 import os
 import json
 
 DB_PATH = '../central_data/flipkart-products-with-hindi.csv'
 OUTPUT_PATH = '../central_data/product_embeddings.csv'
+# asin -> content hash of the semantic text each stored embedding was computed from.
+HASHES_PATH = '../central_data/product_embedding_hashes.csv'
+# Finished shards of an interrupted run; merged into OUTPUT_PATH and removed once a run completes.
+SHARDS_DIR = '../central_data/embedding_shards'
+MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+SHARD_SIZE = 4096
+BATCH_SIZE = 64
 
 def create_semantic_text(row):
     """
@@ -39,41 +49,114 @@ def create_semantic_text(row):
     
     return combined_text
 
-def generate_embeddings():
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def _write_csv_atomic(df, path):
+    """Writes to a temp file and renames it, so a crash never leaves a truncated file behind."""
+    tmp_path = f"{path}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def load_previous_embeddings(full: bool):
     """
-    Generates rich, multilingual text embeddings for each product.
+    Embeddings that can be reused, as {asin: (hash, embedding_json)}: the
+    last completed run's output, overlaid with any shards an interrupted
+    run finished before it stopped.
     """
-    print("--- Starting Multilingual Text Embedding Generation ---")
+    previous = {}
+    if not full and os.path.exists(OUTPUT_PATH) and os.path.exists(HASHES_PATH):
+        hashes = dict(pd.read_csv(HASHES_PATH, dtype=str).itertuples(index=False))
+        for asin, embedding in pd.read_csv(OUTPUT_PATH, dtype=str).itertuples(index=False):
+            if asin in hashes:
+                previous[asin] = (hashes[asin], embedding)
+    for shard_path in sorted(glob.glob(os.path.join(SHARDS_DIR, 'shard-*.csv'))):
+        for asin, digest, embedding in pd.read_csv(shard_path, dtype=str).itertuples(index=False):
+            previous[asin] = (digest, embedding)
+    return previous
+
+def sort_by_token_length(model, texts):
+    """Orders texts by tokenized length so each batch pads to a similar length."""
+    lengths = [len(ids) for ids in model.tokenizer(texts, add_special_tokens=False, truncation=True,
+                                                    max_length=model.max_seq_length)['input_ids']]
+    return np.argsort(lengths, kind='stable')
 
-    print("Loading the multilingual embedding model...")
-    model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-    print("Model loaded successfully.")
+def encode_shards(model, pending, workers: int, shard_size: int, batch_size: int):
+    """Encodes the pending products shard by shard, saving each finished shard before starting the next."""
+    os.makedirs(SHARDS_DIR, exist_ok=True)
+    next_shard = len(glob.glob(os.path.join(SHARDS_DIR, 'shard-*.csv')))
+    pool = model.start_multi_process_pool(['cpu'] * workers) if workers > 1 else None
+    try:
+        for start in range(0, len(pending), shard_size):
+            shard = pending.iloc[start:start + shard_size]
+            embeddings = model.encode(shard['text'].tolist(), batch_size=batch_size, normalize_embeddings=True,
+                                      pool=pool, show_progress_bar=pool is None)
+            _write_csv_atomic(pd.DataFrame({
+                'asin': shard['asin'].values,
+                'content_hash': shard['content_hash'].values,
+                'embedding': [json.dumps(emb.tolist()) for emb in embeddings]
+            }), os.path.join(SHARDS_DIR, f"shard-{next_shard:05d}.csv"))
+            next_shard += 1
+            print(f"  Encoded {min(start + shard_size, len(pending))}/{len(pending)} changed products.")
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+def generate_embeddings(full: bool = False, workers: int = os.cpu_count() or 1,
+                        shard_size: int = SHARD_SIZE, batch_size: int = BATCH_SIZE):
+    """
+    Generates rich, multilingual text embeddings for each product. Only
+    products whose semantic text changed since the last run are encoded;
+    the work is saved in shards so an interrupted run resumes where it stopped.
+    """
+    print("--- Starting Multilingual Text Embedding Generation ---")
 
     try:
         df = pd.read_csv(DB_PATH)
         df.dropna(subset=['title'], inplace=True)
+        df.drop_duplicates(subset=['asin'], inplace=True)
     except FileNotFoundError:
         print(f"Error: Database not found at {DB_PATH}")
         print("Please run the 'prepare_data.py' script first.")
         return
 
     print("Creating rich multilingual semantic text for each product...")
-    texts_to_embed = df.apply(create_semantic_text, axis=1).tolist()
-    
-    print(f"Preparing to generate embeddings for {len(texts_to_embed)} products...")
-    embeddings = model.encode(texts_to_embed, show_progress_bar=True, normalize_embeddings=True)
-    print(f"Embeddings generated successfully. Vector dimension: {embeddings.shape[1]}")
+    df['text'] = df.apply(create_semantic_text, axis=1)
+    df['content_hash'] = df['text'].map(content_hash)
+
+    previous = load_previous_embeddings(full)
+    reusable = np.array([previous.get(asin, (None,))[0] == digest for asin, digest in zip(df['asin'], df['content_hash'])])
+    pending = df[~reusable]
+    print(f"{len(df)} products: {int(reusable.sum())} unchanged, {len(pending)} to encode.")
+
+    if len(pending):
+        print("Loading the multilingual embedding model...")
+        model = SentenceTransformer(MODEL_NAME)
+        print("Model loaded successfully.")
+        pending = pending.iloc[sort_by_token_length(model, pending['text'].tolist())]
+        print(f"Encoding with {workers} worker process(es), {shard_size} products per shard...")
+        encode_shards(model, pending, workers, shard_size, batch_size)
+        previous = load_previous_embeddings(full)
 
     embeddings_df = pd.DataFrame({
         'asin': df['asin'],
-        'embedding': [json.dumps(emb.tolist()) for emb in embeddings]
+        'embedding': [previous[asin][1] for asin in df['asin']]
     })
-    
+
     try:
-        embeddings_df.to_csv(OUTPUT_PATH, index=False)
+        _write_csv_atomic(embeddings_df, OUTPUT_PATH)
+        _write_csv_atomic(df[['asin', 'content_hash']], HASHES_PATH)
+        for shard_path in glob.glob(os.path.join(SHARDS_DIR, 'shard-*.csv')):
+            os.remove(shard_path)
         print(f"✅ Success! Rich multilingual embeddings saved to {OUTPUT_PATH}")
     except Exception as e:
         print(f"❌ Error saving file: {e}")
 
 if __name__ == '__main__':
-    generate_embeddings()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Incrementally generates product embeddings.")
+    parser.add_argument("--full", action="store_true", help="Re-encode every product, ignoring stored hashes.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Encoder processes (1 disables the pool).")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    generate_embeddings(args.full, args.workers, args.shard_size, args.batch_size)
@@ -1,20 +1,47 @@
 import pandas as pd
-from elasticsearch import Elasticsearch
 from elasticsearch.helpers import bulk
+import json
 import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.es_client import create_es_client, ES_BULK_TIMEOUT, ES_BULK_CHUNK_SIZE
 
-ES_HOST = "http://localhost:9200"
 PRODUCTS_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'flipkart-products-with-hindi.csv')
+QUERY_LOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'query_product_log.csv')
+ENTITIES_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'entities.json')
 
-def create_es_client():
-    return Elasticsearch(ES_HOST)
+def entity_weights(df, column):
+    """Clicks (purchases count double) on each entity's products in the query log, as popularity weights."""
+    try:
+        log_df = pd.read_csv(QUERY_LOG_PATH, usecols=['clicked_asin', 'is_purchase'])
+    except (FileNotFoundError, ValueError):
+        return {}
+    log_df['weight'] = 1 + log_df['is_purchase'].fillna(False).astype(bool).astype(int)
+    joined = log_df.merge(df[['asin', column]], left_on='clicked_asin', right_on='asin')
+    return joined.groupby(column)['weight'].sum().to_dict()
+
+def publish_entities(brands, categories):
+    """
+    Writes the brand and category dictionaries for the backend's in-memory
+    prefix index. The file is replaced atomically, so the backend's watcher
+    never reads a partial write.
+    """
+    payload = {"generated_at": datetime.now(timezone.utc).isoformat(), "brands": brands, "categories": categories}
+    tmp_path = f"{ENTITIES_PATH}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, ENTITIES_PATH)
+    print(f"✅ Published {len(brands)} brands and {len(categories)} categories to {ENTITIES_PATH}")
 
 def index_brands_and_categories():
     """
     Extracts unique brands and categories, including their Hindi translations,
     and indexes them into specialized Elasticsearch indices with proper mappings.
     """
-    es_client = create_es_client()
+    es_client = create_es_client(request_timeout=ES_BULK_TIMEOUT)
     try:
         df = pd.read_csv(PRODUCTS_PATH)
         if 'brand_hi' not in df.columns: df['brand_hi'] = ''
@@ -41,7 +68,7 @@ def index_brands_and_categories():
         {"_index": BRAND_INDEX, "_source": {"name": row['brand'], "name_hi": row['brand_hi']}}
         for _, row in unique_brands_df.iterrows()
     ]
-    bulk(es_client, brand_actions)
+    bulk(es_client, brand_actions, chunk_size=ES_BULK_CHUNK_SIZE)
     print(f"✅ Indexed {len(brand_actions)} unique multilingual brands.")
 
     CATEGORY_INDEX = "categories_index"
@@ -61,8 +88,17 @@ def index_brands_and_categories():
         {"_index": CATEGORY_INDEX, "_source": {"name": row['department'], "name_hi": row['department_hi']}}
         for _, row in unique_categories_df.iterrows()
     ]
-    bulk(es_client, category_actions)
+    bulk(es_client, category_actions, chunk_size=ES_BULK_CHUNK_SIZE)
     print(f"✅ Indexed {len(category_actions)} unique multilingual categories.")
 
+    brand_weights = entity_weights(df, 'brand')
+    category_weights = entity_weights(df, 'department')
+    publish_entities(
+        [{"name": a['_source']['name'], "name_hi": a['_source']['name_hi'], "weight": int(brand_weights.get(a['_source']['name'], 0))}
+         for a in brand_actions],
+        [{"name": a['_source']['name'], "name_hi": a['_source']['name_hi'], "weight": int(category_weights.get(a['_source']['name'], 0))}
+         for a in category_actions]
+    )
+
 if __name__ == "__main__":
     index_brands_and_categories()
\ No newline at end of file
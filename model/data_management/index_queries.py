@@ -1,22 +1,16 @@
-import pandas as pd
 from elasticsearch import Elasticsearch
 from elasticsearch.helpers import bulk
 import os
-import regex as re
+import sys
 
-ES_HOST = "http://localhost:9200"
-INDEX_NAME = "queries_index"
-QUERY_LOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'query_product_log.csv')
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-def create_es_client():
-    return Elasticsearch(ES_HOST)
+from backend.es_client import create_es_client, ES_BULK_TIMEOUT, ES_BULK_CHUNK_SIZE
+from backend.query_understanding import detect_language, query_doc_id
+from backend.query_popularity import refresh_query_popularity
 
-def detect_language(text: str) -> str:
-    """Detects if text contains Hindi characters using Unicode properties."""
-    hindi_pattern = re.compile(r'[\p{Devanagari}]')
-    if isinstance(text, str) and hindi_pattern.search(text):
-        return 'hi'
-    return 'en'
+INDEX_NAME = "queries_index"
+QUERY_LOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'query_product_log.csv')
 
 def create_queries_index(client: Elasticsearch):
     """Creates the Elasticsearch index with multilingual completion mappings."""
@@ -35,23 +29,22 @@ def create_queries_index(client: Elasticsearch):
 
 def index_user_queries():
     """Reads a mixed-language query log and indexes queries into the correct language field."""
-    es_client = create_es_client()
+    es_client = create_es_client(request_timeout=ES_BULK_TIMEOUT)
     try:
-        log_df = pd.read_csv(QUERY_LOG_PATH)
-        log_df.dropna(subset=['search_query'], inplace=True)
+        popularity = refresh_query_popularity(QUERY_LOG_PATH)
     except FileNotFoundError:
         print(f"Error: Query log not found at {QUERY_LOG_PATH}")
         return
 
     create_queries_index(es_client)
 
-    query_counts = log_df['search_query'].value_counts().reset_index()
-    query_counts.columns = ['query', 'count']
+    # Time-decayed popularity of each unique query, regardless of language; only new log lines are read.
+    query_counts = popularity.integer_weights()
 
     actions = []
-    for _, row in query_counts.iterrows():
-        query_text = str(row['query'])
-        weight = int(row['count'])
+    for query_text, weight in query_counts.items():
+        query_text = str(query_text)
+        weight = int(weight)
         
         lang = detect_language(query_text)
 
@@ -66,9 +59,9 @@ def index_user_queries():
                 "weight": weight
             }
         }
-        actions.append({"_index": INDEX_NAME, "_source": doc})
+        actions.append({"_index": INDEX_NAME, "_id": query_doc_id(query_text), "_source": doc})
 
-    bulk(es_client, actions)
+    bulk(es_client, actions, chunk_size=ES_BULK_CHUNK_SIZE)
     print(f"✅ Indexed {len(actions)} unique multilingual user queries.")
 
 if __name__ == "__main__":
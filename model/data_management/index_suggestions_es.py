@@ -1,19 +1,35 @@
-import pandas as pd
 from elasticsearch import Elasticsearch
 from elasticsearch.helpers import bulk
 import os
 import json
+import sys
 
-ES_HOST = "http://localhost:9200"
-INDEX_NAME = "products_index"
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-ROOT_DIR = os.path.dirname(SCRIPT_DIR)
-PRODUCTS_PATH = os.path.join(ROOT_DIR, 'central_data', 'flipkart-products-with-hindi.csv')
-EMBEDDINGS_PATH = os.path.join(ROOT_DIR, 'central_data', 'product_embeddings.csv')
+from backend.es_client import create_es_client, ES_BULK_TIMEOUT, ES_BULK_CHUNK_SIZE
+from backend.catalog import load_product_frame, product_document, PRODUCTS_PATH, EMBEDDINGS_PATH
 
-def create_es_client():
-    return Elasticsearch(ES_HOST)
+INDEX_NAME = "products_index"
+# HNSW graph settings for the embedding field. int8_hnsw keeps an int8 copy of each vector
+# in the graph (about 4x less memory than float32) while the float vectors stay on disk for rescoring.
+ES_VECTOR_INDEX_TYPE = os.getenv("ES_VECTOR_INDEX_TYPE", "int8_hnsw")
+ES_VECTOR_SIMILARITY = os.getenv("ES_VECTOR_SIMILARITY", "cosine")
+ES_HNSW_M = int(os.getenv("ES_HNSW_M", "16"))
+ES_HNSW_EF_CONSTRUCTION = int(os.getenv("ES_HNSW_EF_CONSTRUCTION", "100"))
+
+def vector_mapping(embedding_dim: int) -> dict:
+    if ES_VECTOR_INDEX_TYPE not in ("hnsw", "int8_hnsw", "int4_hnsw", "flat", "int8_flat"):
+        raise ValueError(f"Unsupported ES_VECTOR_INDEX_TYPE '{ES_VECTOR_INDEX_TYPE}'.")
+    index_options = {"type": ES_VECTOR_INDEX_TYPE}
+    if ES_VECTOR_INDEX_TYPE.endswith("hnsw"):
+        index_options.update({"m": ES_HNSW_M, "ef_construction": ES_HNSW_EF_CONSTRUCTION})
+    return {
+        "type": "dense_vector",
+        "dims": embedding_dim,
+        "index": True,
+        "similarity": ES_VECTOR_SIMILARITY,
+        "index_options": index_options
+    }
 
 def create_index(client: Elasticsearch, embedding_dim: int):
     if client.indices.exists(index=INDEX_NAME):
@@ -45,7 +61,7 @@ def create_index(client: Elasticsearch, embedding_dim: int):
             "description": {"type": "text", "analyzer": "english"},
             "description_hi": {"type": "text", "analyzer": "hindi"},
             "department": {"type": "keyword"},
-            "embedding": {"type": "dense_vector", "dims": embedding_dim},
+            "embedding": vector_mapping(embedding_dim),
             "rating": {"type": "float"},
             "rating_count": {"type": "integer"},
             "reviews_count": {"type": "integer"},
@@ -64,23 +80,18 @@ def create_index(client: Elasticsearch, embedding_dim: int):
         }
     }
     client.indices.create(index=INDEX_NAME, mappings=mapping, settings=settings)
-    print(f"Index '{INDEX_NAME}' created with nested mapping for specifications.")
+    print(f"Index '{INDEX_NAME}' created with nested mapping for specifications "
+          f"and {mapping['properties']['embedding']['index_options']} vectors.")
 
 def index_products():
-    es_client = create_es_client()
+    es_client = create_es_client(request_timeout=ES_BULK_TIMEOUT)
 
     try:
-        products_df = pd.read_csv(PRODUCTS_PATH)
-        products_df['image_url'] = products_df['image_url'].fillna('')
-        embeddings_df = pd.read_csv(EMBEDDINGS_PATH)
+        data_df = load_product_frame(PRODUCTS_PATH, EMBEDDINGS_PATH)
     except FileNotFoundError as e:
         print(f"Error: A required data file was not found. {e}")
         return
 
-    data_df = pd.merge(products_df, embeddings_df, on='asin')
-    data_df.fillna({'images': '[]', 'product_specifications': '[]'}, inplace=True)
-    data_df.fillna(0, inplace=True)
-
     first_embedding = json.loads(data_df['embedding'].iloc[0])
     embedding_dimension = len(first_embedding)
     
@@ -89,40 +100,10 @@ def index_products():
     actions = []
     print(f"Generating documents for {len(data_df)} products...")
     for _, row in data_df.iterrows():
-        try:
-            spec_list = json.loads(row['product_specifications'])
-        except (TypeError, json.JSONDecodeError):
-            spec_list = []
-
-        try:
-            all_images_list = json.loads(row['images'])
-        except (TypeError, json.JSONDecodeError):
-            all_images_list = []
-
-        doc = {
-            "title": row['title'],
-            "title_hi": row['title_hi'],
-            "brand": row['brand'],
-            "image": row['image_url'],
-            "images": all_images_list,
-            "description": row['description'],
-            "description_hi": row['description_hi'],
-            "department": row['department'],
-            "embedding": json.loads(row['embedding']),
-            "rating": row['rating'],
-            "rating_count": row['rating_count'],
-            "reviews_count": row['reviews_count'],
-            "final_price": row['final_price'],
-            "discount_percentage": row['discount_percentage'],
-            "quality_score": row['quality_score'],
-            "bought_past_month": row['bought_past_month'],
-            "isAvailable": row['isAvailable'],
-            "product_specifications": spec_list
-        }
-        actions.append({"_index": INDEX_NAME, "_id": row['asin'], "_source": doc})
+        actions.append({"_index": INDEX_NAME, "_id": row['asin'], "_source": product_document(row)})
 
     print(f"Indexing {len(actions)} products into Elasticsearch...")
-    bulk(es_client, actions)
+    bulk(es_client, actions, chunk_size=ES_BULK_CHUNK_SIZE)
     print("✅ Product indexing complete.")
 
 if __name__ == "__main__":
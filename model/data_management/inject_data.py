@@ -1,8 +1,11 @@
-import pandas as pd
+import argparse
 import os
 import ast
+import time
 
-DB_PATH = '../central_data/cleaned-amazon-products.csv'
+from product_store import ProductStore, STORE_PATH, export_empty_csv
+
+EXPORT_PATH = '../central_data/injected-products.csv'
 
 REQUIRED_SCHEMA = {
     'title': str,
@@ -37,20 +40,13 @@ REQUIRED_SCHEMA = {
     'badge': str
 }
 
-def inject_new_product():
+def inject_new_product(store: ProductStore):
     """
     Guides a user to input data for a new product, validates it,
     and injects it into the central database.
     """
     print("--- New Product Injection Module ---")
 
-    try:
-        df = pd.read_csv(DB_PATH)
-    except FileNotFoundError:
-        print(f"Error: Database not found at {DB_PATH}")
-        print("Please run the data cleaning script first to create the database.")
-        return
-
     new_product = {}
 
     print("\nPlease enter the details for the new product.")
@@ -81,7 +77,7 @@ def inject_new_product():
                 print(f"Invalid input. Please enter a valid {dtype.__name__}.")
 
     new_asin = new_product['asin']
-    if new_asin in df['asin'].values:
+    if store.exists(new_asin):
         print(f"\n❌ Injection Failed: Product with asin '{new_asin}' already exists.")
         return
 
@@ -91,22 +87,49 @@ def inject_new_product():
     categories_list = new_product.get('categories', [])
     new_product['department'] = categories_list[0].lstrip() if categories_list else 'NA'
 
-
-    new_product_df = pd.DataFrame([new_product])
-    
-
-    new_product_df = new_product_df[df.columns]
-    
-
-    updated_df = pd.concat([df, new_product_df], ignore_index=True)
-    
-
     try:
-        updated_df.to_csv(DB_PATH, index=False)
+        if not store.insert(new_product):
+            print(f"\n❌ Injection Failed: Product with asin '{new_asin}' already exists.")
+            return
         print(f"✅ Injection Successful: Product '{new_product['title']}' has been added to the database.")
+        print("Run the pipeline (or --export) to add it to the catalog.")
     except Exception as e:
-        print(f"❌ Injection Failed: Could not write to file. Error: {e}")
+        print(f"❌ Injection Failed: Could not write to the product store. Error: {e}")
+
+def inject_from_file(store: ProductStore, path: str):
+    """Upserts every product in a CSV, JSON Lines or Parquet file in batched transactions."""
+    started = time.perf_counter()
+    try:
+        written = store.import_file(path)
+    except FileNotFoundError:
+        print(f"❌ Injection Failed: {path} not found.")
+        return
+    print(f"✅ Upserted {written} products from {path} in {time.perf_counter() - started:.2f}s.")
+
+def export_catalog(path: str = EXPORT_PATH):
+    # Without a store nothing has been injected; the pipeline still gets an (empty) file to read.
+    if not os.path.exists(STORE_PATH):
+        export_empty_csv(path)
+        print(f"✅ No product store yet; wrote an empty {path}")
+        return
+    with ProductStore(STORE_PATH) as store:
+        count = store.export_csv(path)
+    print(f"✅ Exported {count} products to {path}")
 
 
 if __name__ == '__main__':
-    inject_new_product()
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description="Adds products to the ASIN-keyed product store; the pipeline merges them into the catalog."
+    )
+    parser.add_argument("--file", help="Batch-upsert the products in this CSV, JSON Lines or Parquet file.")
+    parser.add_argument("--export", action="store_true", help=f"Write the store out to {EXPORT_PATH} for the pipeline.")
+    args = parser.parse_args()
+
+    if args.file or not args.export:
+        with ProductStore(STORE_PATH) as store:
+            if args.file:
+                inject_from_file(store, args.file)
+            else:
+                inject_new_product(store)
+    if args.export:
+        export_catalog()
\ No newline at end of file
@@ -0,0 +1,63 @@
+import pandas as pd
+from sentence_transformers import SentenceTransformer
+import os
+import sys
+import json
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.es_client import create_es_client
+from backend.query_understanding import detect_language, normalize_text
+from backend.search_queries import build_facet_query, parse_facets
+
+INDEX_NAME = "products_index"
+QUERY_LOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'query_product_log.csv')
+OUTPUT_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'precomputed_facets.json')
+TOP_N_QUERIES = 200
+FACET_KNN_K = 100
+KNN_CANDIDATES_MULTIPLIER = 2
+
+def precompute_head_query_facets(top_n: int = TOP_N_QUERIES):
+    """
+    Runs the unfiltered facet aggregation for the most frequent queries in the
+    query log and saves the results, so the search service can serve facets
+    for head queries without an ES round trip.
+    """
+    print("--- Starting Head-Query Facet Precomputation ---")
+    try:
+        log_df = pd.read_csv(QUERY_LOG_PATH)
+        log_df.dropna(subset=['search_query'], inplace=True)
+    except FileNotFoundError:
+        print(f"Error: Query log not found at {QUERY_LOG_PATH}")
+        return
+
+    es_client = create_es_client()
+    model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+
+    normalized_queries = log_df['search_query'].astype(str).map(normalize_text)
+    head_queries = normalized_queries.value_counts().head(top_n).index.tolist()
+    print(f"Computing facets for {len(head_queries)} head queries...")
+
+    query_vectors = model.encode(head_queries, normalize_embeddings=True, show_progress_bar=True)
+
+    facets_by_query = {}
+    for query_text, query_vector in zip(head_queries, query_vectors):
+        body = build_facet_query(query_text, detect_language(query_text), query_vector.tolist(), [],
+                                 FACET_KNN_K, FACET_KNN_K * KNN_CANDIDATES_MULTIPLIER)
+        try:
+            response = es_client.search(index=INDEX_NAME, body=body)
+        except Exception as e:
+            print(f"Could not compute facets for '{query_text}': {e}")
+            continue
+        facets_by_query[query_text] = parse_facets(response)
+
+    try:
+        with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
+            json.dump({"generated_at": int(time.time()), "facets": facets_by_query}, f, ensure_ascii=False)
+        print(f"✅ Success! Facets for {len(facets_by_query)} queries saved to {OUTPUT_PATH}")
+    except Exception as e:
+        print(f"❌ Error saving file: {e}")
+
+if __name__ == "__main__":
+    precompute_head_query_facets()
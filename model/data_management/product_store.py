@@ -0,0 +1,188 @@
+import ast
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+STORE_PATH = os.path.join(os.path.dirname(__file__), '..', 'central_data', 'products.db')
+UPSERT_BATCH_SIZE = 5000
+
+# Catalog columns in CSV order, with their SQLite types. `categories` is a JSON array.
+COLUMN_TYPES = {
+    'timestamp': 'TEXT', 'title': 'TEXT', 'brand': 'TEXT', 'description': 'TEXT',
+    'initial_price': 'REAL', 'final_price': 'REAL', 'currency': 'TEXT', 'availability': 'TEXT',
+    'reviews_count': 'INTEGER', 'categories': 'TEXT', 'asin': 'TEXT', 'number_of_sellers': 'INTEGER',
+    'root_bs_rank': 'INTEGER', 'answered_questions': 'INTEGER', 'url': 'TEXT', 'image_url': 'TEXT',
+    'item_weight': 'TEXT', 'rating': 'REAL', 'product_dimensions': 'TEXT', 'seller_id': 'TEXT',
+    'discount': 'REAL', 'model_number': 'TEXT', 'manufacturer': 'TEXT', 'department': 'TEXT',
+    'plus_content': 'INTEGER', 'top_review': 'TEXT', 'features': 'TEXT', 'ingredients': 'TEXT',
+    'bought_past_month': 'INTEGER', 'is_available': 'INTEGER', 'badge': 'TEXT',
+    'discount_percentage': 'REAL', 'quality_score': 'REAL'
+}
+BOOL_COLUMNS = ('plus_content', 'is_available')
+# Stored columns exported as product_specifications entries, with the key each is given there.
+SPEC_COLUMNS = {
+    'manufacturer': 'Manufacturer', 'model_number': 'Model Number',
+    'item_weight': 'Item Weight', 'product_dimensions': 'Product Dimensions'
+}
+MISSING_TEXT = ('', 'No Info available')
+# The columns of cleaned-flipkart-products.csv, which merge_datasets.py extends with the export.
+CATALOG_COLUMNS = [
+    'asin', 'title', 'description', 'brand', 'initial_price', 'final_price', 'rating', 'images',
+    'product_specifications', 'rating_count', 'reviews_count', 'bought_past_month', 'isAvailable',
+    'image_url', 'categories', 'department'
+]
+
+def _parse_list(value):
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            parsed = json.loads(value)
+        except json.JSONDecodeError:
+            try:
+                parsed = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                return [value]
+        return parsed if isinstance(parsed, list) else [parsed]
+    return []
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        return 1 if value.strip().lower() == 'true' else 0
+    return None if value is None else int(bool(value))
+
+def to_specifications(product: dict) -> str:
+    """
+    The spec columns and each entry of `features` as the JSON list of
+    {"key", "value"} pairs the catalog's product_specifications column holds.
+    """
+    specs = [{"key": key, "value": str(product[column]).strip()} for column, key in SPEC_COLUMNS.items()
+             if product.get(column) is not None and str(product[column]).strip() not in MISSING_TEXT]
+    features = product.get('features')
+    if isinstance(features, str) and features.strip() not in MISSING_TEXT:
+        specs.extend({"key": "Feature", "value": str(feature)} for feature in _parse_list(features))
+    return json.dumps(specs, ensure_ascii=False)
+
+def to_row(product: dict):
+    """A product dict as a tuple of column values in COLUMN_TYPES order."""
+    row = []
+    for column in COLUMN_TYPES:
+        value = product.get(column)
+        if isinstance(value, float) and value != value:
+            value = None
+        if column == 'categories':
+            value = json.dumps(_parse_list(value), ensure_ascii=False)
+        elif column in BOOL_COLUMNS:
+            value = _parse_bool(value)
+        elif hasattr(value, 'item'):
+            value = value.item()
+        row.append(value)
+    return tuple(row)
+
+class ProductStore:
+    """
+    The product catalog in SQLite, keyed by ASIN. WAL mode lets readers keep
+    going while a batch is written; each batch upsert is one transaction.
+    The pipeline reads the stored products through `export_csv`.
+    """
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        columns = ", ".join(
+            f"{name} {sql_type} PRIMARY KEY" if name == 'asin' else f"{name} {sql_type}"
+            for name, sql_type in COLUMN_TYPES.items()
+        )
+        with self.conn:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS products ({columns}) WITHOUT ROWID")
+            # Every read is by primary key or a full export, so secondary indexes would only slow upserts.
+            # Stores created before this dropped them still carry two.
+            self.conn.execute("DROP INDEX IF EXISTS products_department_sales")
+            self.conn.execute("DROP INDEX IF EXISTS products_brand")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    def exists(self, asin: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM products WHERE asin = ?", (asin,)).fetchone() is not None
+
+    def insert(self, product: dict) -> bool:
+        """Adds one product; returns False, changing nothing, if its ASIN already exists."""
+        placeholders = ", ".join("?" * len(COLUMN_TYPES))
+        with self.conn:
+            cursor = self.conn.execute(
+                f"INSERT OR IGNORE INTO products ({', '.join(COLUMN_TYPES)}) VALUES ({placeholders})", to_row(product)
+            )
+        return cursor.rowcount == 1
+
+    def upsert_many(self, products) -> int:
+        """Inserts or replaces products by ASIN, `UPSERT_BATCH_SIZE` per transaction. Returns the count written."""
+        placeholders = ", ".join("?" * len(COLUMN_TYPES))
+        updates = ", ".join(f"{name} = excluded.{name}" for name in COLUMN_TYPES if name != 'asin')
+        sql = (f"INSERT INTO products ({', '.join(COLUMN_TYPES)}) VALUES ({placeholders}) "
+               f"ON CONFLICT(asin) DO UPDATE SET {updates}")
+        written, batch = 0, []
+        for product in products:
+            if not product.get('asin'):
+                continue
+            batch.append(to_row(product))
+            if len(batch) >= UPSERT_BATCH_SIZE:
+                with self.conn:
+                    self.conn.executemany(sql, batch)
+                written, batch = written + len(batch), []
+        if batch:
+            with self.conn:
+                self.conn.executemany(sql, batch)
+            written += len(batch)
+        return written
+
+    def import_file(self, path: str) -> int:
+        """Upserts every product in a CSV, JSON Lines or Parquet file."""
+        if path.endswith('.parquet'):
+            df = pd.read_parquet(path)
+        elif path.endswith(('.jsonl', '.ndjson')):
+            df = pd.read_json(path, lines=True, dtype={'asin': str})
+        else:
+            df = pd.read_csv(path, dtype={'asin': str})
+        df = df.astype(object).where(pd.notna(df), None)
+        return self.upsert_many(df.to_dict(orient='records'))
+
+    def export_csv(self, path: str) -> int:
+        """
+        Writes the stored products in the layout prepare_data.py gives the
+        cleaned catalog: categories as a Python-style list, images as a JSON
+        list, the engagement columns under their catalog names, and the spec
+        columns and features as product_specifications.
+        """
+        df = pd.read_sql_query(f"SELECT {', '.join(COLUMN_TYPES)} FROM products ORDER BY asin", self.conn)
+        df['categories'] = df['categories'].map(lambda value: repr(json.loads(value)) if value else '[]')
+        df['images'] = df['image_url'].map(lambda url: json.dumps([url]) if url else '[]')
+        df['product_specifications'] = [to_specifications(product) for product in df.to_dict(orient='records')]
+        df['rating_count'] = df['reviews_count']
+        df['isAvailable'] = df['is_available'].map({1: True, 0: False})
+        write_catalog_csv(df[CATALOG_COLUMNS], path)
+        return len(df)
+
+def write_catalog_csv(df, path: str):
+    tmp_path = f"{path}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+def export_empty_csv(path: str):
+    """The export of a store that does not exist yet, written without creating one."""
+    write_catalog_csv(pd.DataFrame(columns=CATALOG_COLUMNS), path)
@@ -0,0 +1,292 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+CENTRAL_DATA_DIR = os.path.join(MODEL_DIR, 'central_data')
+STATE_PATH = os.path.join(CENTRAL_DATA_DIR, 'pipeline_state.json')
+LOG_DIR = os.path.join(CENTRAL_DATA_DIR, 'pipeline_logs')
+HASH_CHUNK_SIZE = 1 << 20
+
+class Step:
+    """
+    One pipeline script. `inputs` and `outputs` are paths under central_data;
+    a script that rewrites a file in place lists it in both. `after` names
+    steps this one depends on beyond what its inputs imply (e.g. a live
+    Elasticsearch index), and `needs_es` marks steps that talk to Elasticsearch.
+    """
+    __slots__ = ("name", "script", "args", "inputs", "outputs", "after", "needs_es")
+
+    def __init__(self, name, script, inputs=(), outputs=(), after=(), needs_es=False, args=()):
+        self.name = name
+        self.script = script
+        self.args = tuple(args)
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.after = tuple(after)
+        self.needs_es = needs_es
+
+    @property
+    def script_path(self):
+        return os.path.join(MODEL_DIR, self.script)
+
+PRODUCTS = 'flipkart-products-with-hindi.csv'
+QUERY_LOG = 'query_product_log.csv'
+EMBEDDINGS = 'product_embeddings.csv'
+INJECTED_PRODUCTS = 'injected-products.csv'
+# Appended to by the running API; the popularity aggregator folds it in with the query log.
+LIVE_QUERY_LOG = 'live_query_log.csv'
+
+# Declaration order matters for files rewritten in place: a step depends on the
+# closest earlier step that writes each of its inputs.
+STEPS = [
+    # Products injected with inject_data.py live in the SQLite product store; merge_datasets adds them to the catalog.
+    Step("export_product_store", "data_management/inject_data.py", ["products.db"], [INJECTED_PRODUCTS],
+         args=["--export"]),
+    Step("prepare_data", "data_cleaing/prepare_data.py", ["flipkart-products.csv"],
+         ["cleaned-flipkart-products.csv", "top_departments.json"]),
+    Step("merge_datasets", "central_data/merge_datasets.py",
+         ["cleaned-flipkart-products.csv", "flipkart-cleaned-dataset-hi.csv", INJECTED_PRODUCTS], [PRODUCTS]),
+    Step("add_availability", "central_data/isAvail.py", [PRODUCTS], [PRODUCTS]),
+    Step("add_ranking_features", "data_management/add_ranking_features.py", [PRODUCTS], [PRODUCTS]),
+    Step("generate_embeddings", "data_management/generate_embeddings.py", [PRODUCTS],
+         [EMBEDDINGS, "product_embedding_hashes.csv"]),
+    Step("create_specialized_datasets", "data_management/create_specialized_datasets.py", [PRODUCTS],
+         ["categories_dataset.parquet", "hot_selling_dataset.parquet", "user_preference_history.csv"]),
+    Step("generate_ad_dataset", "data_management/generate_ad_dataset.py", [PRODUCTS, "hot_selling_dataset.parquet"],
+         ["advertisement_dataset.csv"]),
+    Step("generate_query_log", "data_management/generate_query_log.py",
+         ["flipkart-cleaned-dataset-hi.csv", "user_preference_history.csv"], [QUERY_LOG]),
+    Step("build_autosuggest_index", "data_management/build_autosuggest_index.py", [QUERY_LOG, LIVE_QUERY_LOG],
+         ["autosuggest_trie.pkl"]),
+    Step("build_ann_index", "data_management/build_ann_index.py", [EMBEDDINGS], ["ann_index/meta.json"]),
+    Step("index_suggestions_es", "data_management/index_suggestions_es.py", [PRODUCTS, EMBEDDINGS], needs_es=True),
+    Step("index_multilingual_queries", "data_management/index_multilingual_queries.py", [QUERY_LOG, LIVE_QUERY_LOG],
+         needs_es=True),
+    Step("index_entities", "data_management/index_entities.py", [PRODUCTS, QUERY_LOG], ["entities.json"], needs_es=True),
+    Step("precompute_facets", "data_management/precompute_facets.py", [QUERY_LOG], ["precomputed_facets.json"],
+         after=["index_suggestions_es"], needs_es=True),
+]
+
+def data_path(name: str) -> str:
+    return os.path.join(CENTRAL_DATA_DIR, name)
+
+class FileHasher:
+    """SHA-256 of files, reusing the stored hash while a file's size and mtime are unchanged."""
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+        self._lock = threading.Lock()
+
+    def hash(self, path: str):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self.known.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        with self._lock:
+            self.known[path] = [stat.st_mtime_ns, stat.st_size, digest.hexdigest()]
+        return digest.hexdigest()
+
+def upstream_writers(steps):
+    """Maps each step to {file: the nearest earlier step that writes it} for every file it reads or rewrites."""
+    writers = {}
+    for index, step in enumerate(steps):
+        writers[step.name] = {}
+        for path in set(step.inputs) | set(step.outputs):
+            for earlier in reversed(steps[:index]):
+                if path in earlier.outputs:
+                    writers[step.name][path] = earlier.name
+                    break
+    return writers
+
+def dependencies(steps):
+    """Maps each step to the steps it waits for: the nearest earlier writer of each input, plus `after`."""
+    return {step.name: set(step.after) | set(writers.values())
+            for step, writers in zip(steps, upstream_writers(steps).values())}
+
+def fingerprint(step: Step, hasher: FileHasher, state: dict, writers: dict) -> dict:
+    """
+    The script hash plus, per input, the content hash of a source file, or
+    the last run of the step that writes it. Generated files are keyed on
+    their writer's run rather than their content because a later in-place
+    step rewrites them, so their hash never matches the one read here again.
+    Each `after` step is keyed on its last run too, e.g. a reindex that
+    precomputed facets have to follow.
+    """
+    runs = state.get("steps", {})
+    inputs = {}
+    for name in step.inputs:
+        writer = writers.get(name)
+        if writer:
+            inputs[name] = {"step": writer, "run": runs.get(writer, {}).get("finished_at")}
+        else:
+            inputs[name] = hasher.hash(data_path(name))
+    after = [{"step": dep, "run": runs.get(dep, {}).get("finished_at")} for dep in step.after]
+    return {"script": hasher.hash(step.script_path), "inputs": inputs, "after": after}
+
+def is_up_to_date(step: Step, current: dict, state: dict) -> bool:
+    """True when the fingerprint matches the last successful run and every output still exists."""
+    previous = state.get("steps", {}).get(step.name)
+    if not previous or previous.get("fingerprint") != current:
+        return False
+    return all(os.path.exists(data_path(name)) for name in step.outputs)
+
+def run_step(step: Step):
+    """Runs the script from its own directory (the scripts use relative paths) and returns (exit code, seconds, peak RSS in MB)."""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    with open(os.path.join(LOG_DIR, f"{step.name}.log"), 'w', encoding='utf-8') as log:
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.basename(step.script_path), *step.args],
+                                   cwd=os.path.dirname(step.script_path), stdout=log, stderr=subprocess.STDOUT)
+        # wait4 reaps the child and returns its resource usage; ru_maxrss is in KB on Linux.
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return process.returncode, time.perf_counter() - started, usage.ru_maxrss / 1024
+
+def log_tail(step: Step, lines: int = 15) -> str:
+    try:
+        with open(os.path.join(LOG_DIR, f"{step.name}.log"), 'r', encoding='utf-8', errors='replace') as f:
+            return "".join(f.readlines()[-lines:])
+    except FileNotFoundError:
+        return ""
+
+def load_state() -> dict:
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_state(state: dict):
+    tmp_path = f"{STATE_PATH}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_PATH)
+
+def run_pipeline(steps, workers: int, force: bool = False, dry_run: bool = False):
+    """
+    Runs the steps in dependency order, up to `workers` at a time. A step
+    is skipped when it is up to date; a failed step blocks its dependents.
+    Returns {step name: (status, seconds, peak MB)}.
+    """
+    state = load_state()
+    hasher = FileHasher(state.get("files"))
+    selected = {step.name for step in steps}
+    deps = {name: needed & selected for name, needed in dependencies(STEPS).items() if name in selected}
+    # Taken from every step, so a selected step is still keyed on the runs of unselected upstream steps.
+    writers = upstream_writers(STEPS)
+    by_name = {step.name: step for step in steps}
+    results, pending, running, fingerprints = {}, [step.name for step in steps], {}, {}
+
+    def ready(name):
+        return all(dep in results for dep in deps[name])
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for name in [n for n in pending if ready(n)]:
+                pending.remove(name)
+                step = by_name[name]
+                if any(results[dep][0] in ("failed", "blocked") for dep in deps[name]):
+                    results[name] = ("blocked", 0.0, 0.0)
+                    continue
+                # Taken only now, after every upstream step has finished (and recorded its run), and
+                # before this step runs, since it may rewrite its own inputs.
+                fingerprints[name] = fingerprint(step, hasher, state, writers[name])
+                # A dry run records no runs, so a dependency that would run has to be propagated by hand.
+                upstream_would_run = dry_run and any(results[dep][0] == "would run" for dep in deps[name])
+                if not force and not upstream_would_run and is_up_to_date(step, fingerprints[name], state):
+                    results[name] = ("skipped", 0.0, 0.0)
+                    continue
+                if dry_run:
+                    results[name] = ("would run", 0.0, 0.0)
+                    continue
+                print(f"▶ {name}")
+                running[pool.submit(run_step, step)] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                step = by_name[name]
+                try:
+                    code, seconds, peak_mb = future.result()
+                except Exception as e:
+                    print(f"❌ {name} could not be started: {e}")
+                    code, seconds, peak_mb = -1, 0.0, 0.0
+                # The scripts report most errors by printing rather than exiting non-zero;
+                # a missing declared output is treated as a failure too.
+                missing = [o for o in step.outputs if not os.path.exists(data_path(o))]
+                if code == 0 and not missing:
+                    results[name] = ("ran", seconds, peak_mb)
+                    state.setdefault("steps", {})[name] = {
+                        "fingerprint": fingerprints[name],
+                        "finished_at": time.time(), "seconds": round(seconds, 2), "peak_mb": round(peak_mb, 1)
+                    }
+                    print(f"✅ {name} ({seconds:.1f}s, peak {peak_mb:.0f} MB)")
+                else:
+                    results[name] = ("failed", seconds, peak_mb)
+                    reason = f"exit code {code}" if code else f"missing outputs: {', '.join(missing)}"
+                    print(f"❌ {name} failed ({reason}). Last lines of its log:\n{log_tail(step)}")
+
+    if not dry_run:
+        state["files"] = hasher.known
+        save_state(state)
+    return {step.name: results[step.name] for step in steps}
+
+def print_report(results):
+    print(f"\n{'step':<30}{'status':>11}{'wall s':>10}{'peak MB':>10}")
+    for name, (status, seconds, peak_mb) in results.items():
+        print(f"{name:<30}{status:>11}{seconds:>10.1f}{peak_mb:>10.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the data pipeline, skipping steps whose inputs have not changed.")
+    parser.add_argument("--only", nargs="*", help="Run just these steps (their dependencies are assumed done).")
+    parser.add_argument("--from-step", help="Start at this step and run everything declared after it.")
+    parser.add_argument("--no-es", action="store_true", help="Leave out the steps that need Elasticsearch.")
+    parser.add_argument("--force", action="store_true", help="Run the selected steps even if they are up to date.")
+    parser.add_argument("--workers", type=int, default=max(os.cpu_count() or 1, 2), help="Steps to run at once.")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would run without running it.")
+    parser.add_argument("--list", action="store_true", help="List the steps with their dependencies.")
+    args = parser.parse_args()
+
+    if args.list:
+        deps = dependencies(STEPS)
+        for step in STEPS:
+            print(f"{step.name:<30}after: {', '.join(sorted(deps[step.name])) or '-'}")
+        return
+
+    steps = STEPS
+    if args.from_step:
+        names = [step.name for step in STEPS]
+        if args.from_step not in names:
+            parser.error(f"Unknown step '{args.from_step}'.")
+        steps = steps[names.index(args.from_step):]
+    if args.only:
+        unknown = set(args.only) - {step.name for step in STEPS}
+        if unknown:
+            parser.error(f"Unknown step(s): {', '.join(sorted(unknown))}")
+        steps = [step for step in steps if step.name in args.only]
+    if args.no_es:
+        steps = [step for step in steps if not step.needs_es]
+
+    results = run_pipeline(steps, args.workers, args.force, args.dry_run)
+    print_report(results)
+    if any(status in ("failed", "blocked") for status, _, _ in results.values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()